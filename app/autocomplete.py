@@ -0,0 +1,245 @@
+import heapq
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .database import Movie
+from .services import MovieService
+from .text import normalize
+
+# Build the prefix index at startup; when disabled autocomplete falls back to SQL.
+# Off by default: every worker holds its own copy (about 640 bytes per movie)
+# and each write pays an O(n) list insert
+AUTOCOMPLETE_INDEX_ENABLED = os.getenv("AUTOCOMPLETE_INDEX_ENABLED", "false").lower() == "true"
+
+# Keys are cut to this many bytes; longer queries are re-checked against the text
+MAX_KEY_BYTES = 32
+# Prefixes matching more keys than this keep a ranked top list instead of scanning
+HEAVY_PREFIX_KEYS = 2000
+TOP_K = 50
+MAX_MEMO_ENTRIES = 4096
+
+_ID_MASK = (1 << 32) - 1
+
+def _keys(title: str, director: str) -> List[bytes]:
+    """Index keys for a movie: every word-start suffix of its title and director"""
+    keys = set()
+    for text in (normalize(title), normalize(director)):
+        words = text.split(" ")
+        for start in range(len(words)):
+            keys.add(" ".join(words[start:]).encode()[:MAX_KEY_BYTES])
+    keys.discard(b"")
+    return sorted(keys)
+
+def _rating_key(movie_id: int, rating: float) -> int:
+    """Sort key ordering movies by rating descending, then by ID"""
+    return (10000 - round(rating * 1000)) << 32 | movie_id
+
+class AutocompleteIndex:
+    """Sorted-array prefix index over normalised titles and directors.
+
+    Every word-start suffix of a title or director is one key, so "mat"
+    finds "The Matrix" and "nol" finds "Christopher Nolan". Keys are UTF-8
+    bytes in a sorted list with a parallel array of movie IDs; a prefix is
+    two binary searches. Matches are ranked by rating.
+
+    Short, popular prefixes match too many keys to rank per request. For
+    those the index walks movies in rating order until it has enough
+    matches, then keeps the ranked top list and updates it on each write.
+    Answers for other prefixes are memoised until the next write.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.loaded = False
+            self._keys: List[bytes] = []
+            self._ids = array("i")
+            self._by_rating = array("q")
+            self._movies: Dict[int, Tuple[str, str, float]] = {}
+            self._top: Dict[bytes, List[int]] = {}
+            self._memo: Dict[Tuple[str, int], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._movies)
+
+    def load(self, db: Session, batch_size: int = 10000) -> None:
+        """Replace the contents with a full scan of the movies table"""
+        self.load_rows(
+            db.query(Movie.id, Movie.title, Movie.director, Movie.rating).yield_per(batch_size)
+        )
+
+    def load_rows(self, rows: Iterable[Tuple[int, str, str, float]]) -> None:
+        """Replace the contents with (id, title, director, rating) rows"""
+        with self._lock:
+            self.clear()
+            entries = []
+            for movie_id, title, director, rating in rows:
+                self._movies[movie_id] = (title, director, rating)
+                entries.extend((key, movie_id) for key in _keys(title, director))
+            entries.sort()
+            self._keys = [key for key, _ in entries]
+            self._ids = array("i", (movie_id for _, movie_id in entries))
+            self._by_rating = array("q", sorted(
+                _rating_key(movie_id, movie[2]) for movie_id, movie in self._movies.items()
+            ))
+            self.loaded = True
+
+    def load_snapshot(self, snapshot) -> None:
+        """Replace the contents with a warm-start snapshot (see app.snapshot).
+
+        The sorted keys are taken as written unless they were cut to a
+        different MAX_KEY_BYTES, in which case they are rebuilt from the rows.
+        """
+        rows = ((movie_id, title, director, rating) for movie_id, title, director, _, rating in snapshot.movies())
+        if snapshot.meta.get("max_key_bytes") != MAX_KEY_BYTES:
+            self.load_rows(rows)
+            return
+        with self._lock:
+            self.clear()
+            self._movies = {movie_id: (title, director, rating) for movie_id, title, director, rating in rows}
+            self._keys = snapshot.byte_strings("key")
+            self._ids = snapshot.array("key_ids")
+            self._by_rating = snapshot.array("by_rating")
+            self.loaded = True
+
+    def apply(self, op: str, movie_id: int, values: Optional[dict]) -> None:
+        """MovieService change listener keeping the index in sync with writes"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._memo.clear()
+            previous = self._movies.pop(movie_id, None)
+            if previous is not None:
+                keys = _keys(previous[0], previous[1])
+                # A top list that loses a member can't be refilled in place
+                for prefix in self._top_prefixes(keys):
+                    if movie_id in self._top[prefix]:
+                        del self._top[prefix]
+                for key in keys:
+                    lo = bisect_left(self._keys, key)
+                    hi = bisect_right(self._keys, key, lo)
+                    position = lo + self._ids[lo:hi].index(movie_id)
+                    del self._keys[position]
+                    del self._ids[position]
+                key = _rating_key(movie_id, previous[2])
+                del self._by_rating[bisect_left(self._by_rating, key)]
+            if op == "delete":
+                return
+            self._movies[movie_id] = (values["title"], values["director"], values["rating"])
+            keys = _keys(values["title"], values["director"])
+            for key in keys:
+                position = bisect_right(self._keys, key)
+                self._keys.insert(position, key)
+                self._ids.insert(position, movie_id)
+            key = _rating_key(movie_id, values["rating"])
+            self._by_rating.insert(bisect_left(self._by_rating, key), key)
+            for prefix in self._top_prefixes(keys):
+                self._top[prefix] = self._rank(self._top[prefix] + [movie_id], TOP_K)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Highest-rated movies whose title or director has a word starting with query"""
+        text = normalize(query)
+        if not text:
+            return []
+        with self._lock:
+            best = self._search(text, limit)
+            movies = self._movies
+            return [
+                {
+                    "id": movie_id,
+                    "title": movies[movie_id][0],
+                    "director": movies[movie_id][1],
+                    "rating": movies[movie_id][2],
+                }
+                for movie_id in best
+            ]
+
+    def _search(self, text: str, limit: int) -> List[int]:
+        encoded = text.encode()
+        prefix = encoded[:MAX_KEY_BYTES]
+        if prefix in self._top and limit <= TOP_K:
+            return self._top[prefix][:limit]
+        best = self._memo.get((text, limit))
+        if best is not None:
+            return best
+
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + b"\xff", lo)
+        if hi - lo > HEAVY_PREFIX_KEYS and limit <= TOP_K and prefix == encoded:
+            top = self._walk_by_rating(text, TOP_K, hi - lo)
+            if top is None:
+                top = self._rank(set(self._ids[lo:hi]), TOP_K)
+            self._top[prefix] = top
+            return top[:limit]
+
+        candidates = set(self._ids[lo:hi])
+        if len(encoded) > MAX_KEY_BYTES:
+            candidates = {movie_id for movie_id in candidates if self._matches(movie_id, text)}
+        best = self._memo[(text, limit)] = self._rank(candidates, limit)
+        if len(self._memo) > MAX_MEMO_ENTRIES:
+            self._memo.pop(next(iter(self._memo)))
+        return best
+
+    def _walk_by_rating(self, text: str, limit: int, matching_keys: int) -> Optional[List[int]]:
+        """Scan movies from the highest rating down, stopping after limit matches.
+
+        With m of n keys matching, about limit * n / m movies are visited.
+        Gives up (returns None) after four times that, so a scan of the key
+        range is never much slower than the walk would have been.
+        """
+        budget = 4 * limit * max(len(self._keys) // matching_keys, 1)
+        found = []
+        for key in self._by_rating[:budget]:
+            movie_id = key & _ID_MASK
+            if self._matches(movie_id, text):
+                found.append(movie_id)
+                if len(found) == limit:
+                    return found
+        return found if budget >= len(self._by_rating) else None
+
+    def _top_prefixes(self, keys: List[bytes]) -> List[bytes]:
+        """Prefixes of the given keys that currently have a top list"""
+        return list({
+            key[:length]
+            for key in keys
+            for length in range(1, len(key) + 1)
+            if key[:length] in self._top
+        })
+
+    def _rank(self, movie_ids, limit: int) -> List[int]:
+        movies = self._movies
+        return heapq.nlargest(limit, movie_ids, key=lambda movie_id: (movies[movie_id][2], -movie_id))
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by the keys, IDs and per-movie display data"""
+        with self._lock:
+            return {
+                "movies": len(self._movies),
+                "keys": len(self._keys),
+                "key_bytes": sys.getsizeof(self._keys) + sum(sys.getsizeof(key) for key in self._keys),
+                "id_bytes": (len(self._ids) * self._ids.itemsize
+                             + len(self._by_rating) * self._by_rating.itemsize),
+                "movie_bytes": sys.getsizeof(self._movies) + sum(
+                    sys.getsizeof(entry) + sys.getsizeof(entry[0]) + sys.getsizeof(entry[1])
+                    for entry in self._movies.values()
+                ),
+            }
+
+    def _matches(self, movie_id: int, text: str) -> bool:
+        title, director, _ = self._movies[movie_id]
+        return any(
+            f" {text}" in f" {normalize(value)}"
+            for value in (title, director)
+        )
+
+autocomplete_index = AutocompleteIndex()
+MovieService.subscribe(autocomplete_index.apply)
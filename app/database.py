@@ -1,16 +1,22 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float
+from sqlalchemy import create_engine, inspect, text, Boolean, Column, Integer, String, Float, DateTime, JSON
 from sqlalchemy.orm import declarative_base, sessionmaker
+from datetime import datetime, timezone
 import os
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./movies.db")
 TEST_DATABASE_URL = "sqlite:///./test_movies.db"
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def make_engine(url: str):
+    """Create an engine for a database URL, as the app and job workers both need"""
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {}
+    )
+
+engine = make_engine(DATABASE_URL)
+# expire_on_commit=False lets writes return their objects without a re-SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 # Test database setup
@@ -18,7 +24,7 @@ test_engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False}
 )
-TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=test_engine)
 
 class Movie(Base):
     __tablename__ = "movies"
@@ -28,14 +34,67 @@ class Movie(Base):
     director = Column(String, nullable=False)
     year = Column(Integer, nullable=False)
     rating = Column(Float, nullable=False)
+    # Normalised "title|director|year"; see services.dedup_key
+    dedup_key = Column(String, unique=True, index=True, nullable=True)
+
+class MovieChange(Base):
+    """Append-only log of movie writes, one row per create/update/delete"""
+    __tablename__ = "movie_changes"
+    # AUTOINCREMENT keeps sequence numbers strictly increasing on SQLite
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    seq = Column(Integer, primary_key=True)
+    movie_id = Column(Integer, nullable=False, index=True)
+    op = Column(String, nullable=False)
+    data = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+class Job(Base):
+    """A background job and its progress, shared with the worker process running it"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed | cancelled
+    status = Column(String, nullable=False, default="queued", index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    progress = Column(Float, nullable=False, default=0.0)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # "host:pid:start" of the app process whose pool runs the job; see jobs.JobManager.recover
+    owner = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+def migrate(bind) -> None:
+    """Add columns introduced after a database file was first created.
+    
+    Existing rows get a NULL dedup key; python -m app.dedup backfills them.
+    Existing jobs get a NULL owner and are treated as left over from a previous run.
+    """
+    columns = {column["name"] for column in inspect(bind).get_columns("movies")}
+    if "dedup_key" not in columns:
+        with bind.begin() as connection:
+            connection.execute(text("ALTER TABLE movies ADD COLUMN dedup_key VARCHAR"))
+            connection.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_movies_dedup_key ON movies (dedup_key)"
+            ))
+    inspector = inspect(bind)
+    if inspector.has_table("jobs") and "owner" not in {column["name"] for column in inspector.get_columns("jobs")}:
+        with bind.begin() as connection:
+            connection.execute(text("ALTER TABLE jobs ADD COLUMN owner VARCHAR"))
 
 def create_tables():
     """Create database tables"""
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
 
 def create_test_tables():
     """Create test database tables"""
     Base.metadata.create_all(bind=test_engine)
+    migrate(test_engine)
 
 def get_db():
     """Dependency to get database session"""
@@ -0,0 +1,100 @@
+"""
+Backfill dedup keys and merge duplicate movies.
+
+Usage: python -m app.dedup [--batch-size N] [--dry-run]
+"""
+
+import argparse
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from .database import Movie, SessionLocal, create_tables
+from .services import _record_change, dedup_key
+
+def merge_duplicates(
+    db: Session,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+    on_batch: Optional[Callable[[Dict[str, int]], None]] = None
+) -> Dict[str, int]:
+    """Walk the movies table in ID order, one committed batch at a time.
+
+    Rows whose stored dedup key is missing or out of date get the current
+    key. When another movie already holds that key, the one with the lower
+    ID survives: a newer holder is deleted and the older row re-keyed,
+    otherwise the row itself is the duplicate and is deleted.
+    Batches are read by keyset (id > last seen), so memory stays flat and
+    concurrent writes are never blocked for longer than one batch.
+    on_batch is called with the running counts after each batch.
+    """
+    stats = {"scanned": 0, "backfilled": 0, "merged": 0}
+    # A dry run never writes its backfilled keys, so later batches check these too
+    claimed: Dict[str, int] = {}
+    last_id = 0
+    while True:
+        if on_batch is not None and stats["scanned"]:
+            on_batch(stats)
+        rows = db.query(
+            Movie.id, Movie.title, Movie.director, Movie.year, Movie.dedup_key
+        ).filter(Movie.id > last_id).order_by(Movie.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        stats["scanned"] += len(rows)
+
+        stale = {}
+        for row in rows:
+            key = dedup_key(row.title, row.director, row.year)
+            if key != row.dedup_key:
+                stale[row.id] = key
+        if not stale:
+            continue
+
+        holders = dict(
+            db.query(Movie.dedup_key, Movie.id).filter(Movie.dedup_key.in_(set(stale.values())))
+        )
+        backfill, duplicates = [], []
+        for movie_id, key in stale.items():
+            holder = claimed.get(key, holders.get(key))
+            if holder is not None and holder < movie_id:
+                duplicates.append(movie_id)
+                continue
+            if holder is not None:
+                # A newer row was keyed first (e.g. added through the API)
+                duplicates.append(holder)
+            holders[key] = movie_id
+            backfill.append({"id": movie_id, "dedup_key": key})
+        stats["backfilled"] += len(backfill)
+        stats["merged"] += len(duplicates)
+        if dry_run:
+            claimed.update((entry["dedup_key"], entry["id"]) for entry in backfill)
+            continue
+
+        if duplicates:
+            db.execute(delete(Movie).where(Movie.id.in_(duplicates)))
+            for movie_id in duplicates:
+                _record_change(db, "delete", movie_id)
+        if backfill:
+            db.execute(update(Movie), backfill)
+        db.commit()
+    return stats
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count without writing")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        stats = merge_duplicates(db, args.batch_size, args.dry_run)
+    finally:
+        db.close()
+    print(f"{stats['scanned']} movies scanned, {stats['backfilled']} keys backfilled, "
+          f"{stats['merged']} duplicates removed{' (dry run)' if args.dry_run else ''}")
+
+if __name__ == "__main__":
+    main()
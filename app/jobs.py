@@ -0,0 +1,367 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Dict, Iterator, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from .database import DATABASE_URL, Job, Movie, make_engine
+from .dedup import merge_duplicates
+from .schemas import JobKind, MovieCreate, MovieResponse
+from .services import MovieService
+from .snapshot import SNAPSHOT_PATH, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for background jobs, per app process; further submissions wait in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Submissions are refused while this many jobs are queued or running, across all app processes
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+# Export jobs write here and import jobs read from here
+JOB_DATA_DIR = os.getenv("JOB_DATA_DIR", "./job_data")
+
+FINISHED = ("succeeded", "failed", "cancelled")
+PENDING = ("queued", "running")
+# Kinds that write movies from the worker, whose changes this process must replay
+WRITING_KINDS = ("import", "dedup")
+CHUNK_SIZE = 1000
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when too many jobs are pending"""
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _process_start(pid: int) -> str:
+    """Start time of a process in clock ticks since boot, or "" where /proc is unavailable.
+
+    Tells a live owner apart from a later process that reused its PID, as a
+    restarted container's app usually does.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Fields after the parenthesised command name; starttime is field 22
+            return stat.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return ""
+
+def process_owner(pid: Optional[int] = None) -> str:
+    """Owner tag for jobs run by the app process pid (default: this one)"""
+    pid = os.getpid() if pid is None else pid
+    return f"{socket.gethostname()}:{pid}:{_process_start(pid)}"
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """Whether the app process that owns a job may still be running it.
+
+    Owners on other hosts cannot be checked and are assumed alive; jobs
+    recorded before owners existed are assumed dead.
+    """
+    if not owner:
+        return False
+    host, pid, start = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return _process_start(int(pid)) == start
+
+class JobContext:
+    """Handed to job handlers to report progress and observe cancellation"""
+
+    def __init__(self, db: Session, job_id: int, data_dir: str):
+        self.db = db
+        self.job_id = job_id
+        self.data_dir = data_dir
+
+    def path(self, name: str) -> str:
+        """A file in the data directory; directory parts of name are ignored"""
+        return os.path.join(self.data_dir, os.path.basename(name))
+
+    def progress(self, fraction: float) -> None:
+        """Persist progress, raising JobCancelled if a cancel was requested"""
+        cancel_requested = self.db.execute(
+            update(Job).where(Job.id == self.job_id)
+            .values(progress=min(fraction, 1.0))
+            .returning(Job.cancel_requested)
+        ).scalar()
+        self.db.commit()
+        if cancel_requested:
+            raise JobCancelled()
+
+def _export(db: Session, context: JobContext, params: dict) -> dict:
+    """Write every movie as NDJSON, in ID order"""
+    total = MovieService.get_movies_count(db)
+    name = os.path.basename(params.get("file") or f"movies-{context.job_id}.ndjson")
+    path = context.path(name)
+    os.makedirs(context.data_dir, exist_ok=True)
+    written = 0
+    last_id = 0
+    try:
+        with open(path, "w") as output:
+            while True:
+                movies = db.query(Movie).filter(Movie.id > last_id).order_by(Movie.id).limit(CHUNK_SIZE).all()
+                if not movies:
+                    break
+                for movie in movies:
+                    output.write(MovieResponse.model_validate(movie).model_dump_json() + "\n")
+                written += len(movies)
+                last_id = movies[-1].id
+                context.progress(written / max(total, 1))
+    except JobCancelled:
+        os.remove(path)
+        raise
+    return {"file": name, "rows": written}
+
+def _records(context: JobContext, params: dict) -> Iterator[dict]:
+    if "movies" in params:
+        yield from params["movies"]
+        return
+    with open(context.path(params["file"])) as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+def _import(db: Session, context: JobContext, params: dict) -> dict:
+    """Create movies from params["movies"] or an NDJSON file, CHUNK_SIZE per transaction"""
+    on_conflict = params.get("on_conflict", "skip")
+    if "movies" in params:
+        total = len(params["movies"])
+    else:
+        with open(context.path(params["file"])) as source:
+            total = sum(1 for line in source if line.strip())
+    counts = {"created": 0, "skipped": 0, "updated": 0}
+    done = 0
+    records = _records(context, params)
+    while True:
+        chunk = [
+            MovieCreate(**{name: value for name, value in record.items() if name != "id"})
+            for record in islice(records, CHUNK_SIZE)
+        ]
+        if not chunk:
+            break
+        for _, status in MovieService.upsert_movies(db, chunk, on_conflict):
+            counts[status] += 1
+        done += len(chunk)
+        context.progress(done / max(total, 1))
+    return counts
+
+def _dedup(db: Session, context: JobContext, params: dict) -> dict:
+    """Backfill dedup keys and merge duplicates, see app.dedup"""
+    total = MovieService.get_movies_count(db)
+    return merge_duplicates(
+        db,
+        params.get("batch_size", CHUNK_SIZE),
+        params.get("dry_run", False),
+        on_batch=lambda stats: context.progress(stats["scanned"] / max(total, 1))
+    )
+
+def _stats(db: Session, context: JobContext, params: dict) -> dict:
+    """Recompute catalog-wide aggregates"""
+    return MovieService.get_movie_stats(db)
+
+def _snapshot(db: Session, context: JobContext, params: dict) -> dict:
+    """Write the warm-start snapshot to SNAPSHOT_PATH, or to the data directory"""
+    if not SNAPSHOT_PATH:
+        os.makedirs(context.data_dir, exist_ok=True)
+    return write_snapshot(db, SNAPSHOT_PATH or context.path("movies.snapshot"))
+
+JOB_HANDLERS: Dict[str, Callable[[Session, JobContext, dict], dict]] = {
+    "export": _export,
+    "import": _import,
+    "dedup": _dedup,
+    "stats": _stats,
+    "snapshot": _snapshot,
+}
+
+def _finish(db: Session, job: Job, status: str, **values) -> str:
+    job.status = status
+    job.finished_at = _now()
+    for name, value in values.items():
+        setattr(job, name, value)
+    db.commit()
+    return status
+
+def run_job(database_url: str, job_id: int, data_dir: str) -> str:
+    """Worker-process entry point: run one job and persist its outcome"""
+    engine = make_engine(database_url)
+    db = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)()
+    try:
+        job = db.get(Job, job_id)
+        if job.cancel_requested:
+            return _finish(db, job, "cancelled")
+        job.status = "running"
+        job.started_at = _now()
+        db.commit()
+
+        try:
+            result = JOB_HANDLERS[job.kind](db, JobContext(db, job_id, data_dir), job.params or {})
+        except JobCancelled:
+            db.rollback()
+            return _finish(db, job, "cancelled")
+        except Exception as e:
+            db.rollback()
+            logger.exception("Job %s failed", job_id)
+            return _finish(db, job, "failed", error=f"{type(e).__name__}: {e}")
+        return _finish(db, job, "succeeded", result=result, progress=1.0)
+    finally:
+        db.close()
+        engine.dispose()
+
+class JobManager:
+    """Runs jobs in a bounded pool of worker processes.
+
+    The jobs table is the source of truth: workers open their own database
+    connection and record status, progress and results there, so request
+    handlers only ever read a row. Cancelling a queued job drops it from
+    the pool; a running job stops at its next progress report.
+
+    Movie writes made by a worker publish no in-process notifications, so
+    when an import or dedup job ends its logged changes are replayed to
+    this process's listeners.
+
+    Each app process has its own pool, so with N app processes up to
+    N * max_workers jobs run at once. max_pending counts unfinished jobs
+    in the table, so it bounds them all. Jobs record the app process that
+    owns them. Those left unfinished by a process that has exited are
+    failed by recover(), and can be cancelled at any time.
+    """
+
+    def __init__(
+        self,
+        database_url: str = DATABASE_URL,
+        max_workers: int = JOB_WORKERS,
+        max_pending: int = JOB_QUEUE_LIMIT,
+        data_dir: str = JOB_DATA_DIR
+    ):
+        self.database_url = database_url
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.data_dir = data_dir
+        self._sessions = sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=make_engine(database_url)
+        )
+        self.owner = process_owner()
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[int, Future] = {}
+        self._done: Dict[int, threading.Event] = {}
+
+    def submit(self, kind: JobKind, params: Optional[dict] = None) -> Job:
+        """Record a queued job and hand it to the pool"""
+        with self._lock:
+            with self._sessions() as db:
+                pending = db.query(func.count(Job.id)).filter(Job.status.in_(PENDING)).scalar()
+                if pending >= self.max_pending:
+                    raise JobQueueFull(f"{pending} jobs are already pending")
+                since = MovieService.last_change_seq(db) if kind in WRITING_KINDS else None
+                job = Job(
+                    kind=kind, params=params or {}, status="queued", progress=0.0,
+                    cancel_requested=False, owner=self.owner
+                )
+                db.add(job)
+                db.commit()
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            future = self._executor.submit(run_job, self.database_url, job.id, self.data_dir)
+            self._futures[job.id] = future
+            self._done[job.id] = threading.Event()
+        future.add_done_callback(lambda done: self._finished(job.id, since, done))
+        return job
+
+    def _finished(self, job_id: int, since: Optional[int], future: Future) -> None:
+        try:
+            with self._sessions() as db:
+                if future.cancelled() or future.exception() is not None:
+                    # The worker never recorded an outcome; do it here
+                    job = db.get(Job, job_id)
+                    if job.status not in FINISHED:
+                        job.status = "cancelled" if future.cancelled() else "failed"
+                        job.error = None if future.cancelled() else repr(future.exception())
+                        job.finished_at = _now()
+                        db.commit()
+                if since is not None:
+                    MovieService.replay_changes(db, since)
+        except Exception:
+            logger.exception("Recording the end of job %s failed", job_id)
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._done.pop(job_id).set()
+
+    def recover(self) -> int:
+        """Fail unfinished jobs whose owning app process has exited; returns how many.
+
+        Run at startup, so a restart or crash does not leave jobs queued or
+        running forever.
+        """
+        with self._sessions() as db:
+            orphans = [
+                job for job in db.query(Job).filter(
+                    Job.status.in_(PENDING), or_(Job.owner.is_(None), Job.owner != self.owner)
+                )
+                if not owner_alive(job.owner)
+            ]
+            for job in orphans:
+                job.status = "failed"
+                job.error = "Interrupted: the app process running it exited"
+                job.finished_at = _now()
+            db.commit()
+        if orphans:
+            logger.warning("Failed %d jobs left unfinished by a previous run", len(orphans))
+        return len(orphans)
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """The current state of a job, or None if it does not exist"""
+        with self._sessions() as db:
+            return db.get(Job, job_id)
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """Request cancellation; queued jobs are cancelled immediately"""
+        with self._sessions() as db:
+            job = db.get(Job, job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            future = self._futures.get(job_id)
+            if (future is not None and future.cancel()) or (future is None and not owner_alive(job.owner)):
+                # Dropped from the pool, or nothing is left to run it
+                job.status = "cancelled"
+                job.finished_at = _now()
+            db.commit()
+            return job
+
+    def wait(self, job_id: int, timeout: Optional[float] = None) -> Optional[Job]:
+        """Block until a job submitted here has finished, then return it"""
+        done = self._done.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.get(job_id)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the pool; jobs still queued are cancelled"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+job_manager = JobManager()
+
+def get_job_manager() -> JobManager:
+    """Dependency returning the job manager, so tests can point it elsewhere"""
+    return job_manager
@@ -1,11 +1,74 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import create_tables
-from .routers import router
+from .autocomplete import AUTOCOMPLETE_INDEX_ENABLED, autocomplete_index
+from .database import create_tables, get_db
+from .jobs import get_job_manager
+from .read_model import READ_MODEL_ENABLED, read_model
+from .similar import SIMILAR_INDEX_ENABLED, similar_index
+from .response_cache import ResponseCacheMiddleware
+from .routers import batch_router, jobs_router, router
+from .services import MovieService
+from .snapshot import SNAPSHOT_MAX_REPLAY, SNAPSHOT_PATH, open_snapshot
+from .tracing import TracingMiddleware
+
+logger = logging.getLogger(__name__)
+
+def warm_caches(app: FastAPI) -> None:
+    """Load in-process read models and indexes using the app's database dependency.
+    
+    With a readable, recent SNAPSHOT_PATH taken from this database they load
+    from the snapshot instead of a table scan, then replay the change log
+    from its sequence.
+    """
+    provider = app.dependency_overrides.get(get_db, get_db)
+    sessions = provider()
+    db = next(sessions)
+    snapshot = open_snapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+    try:
+        if snapshot is not None:
+            # A snapshot ahead of the change log was taken from another (or a restored) database
+            behind = MovieService.last_change_seq(db) - snapshot.change_seq
+            if behind < 0 or behind > SNAPSHOT_MAX_REPLAY:
+                logger.warning(
+                    "Ignoring snapshot %s, %d changes %s the change log; scanning the table",
+                    SNAPSHOT_PATH, abs(behind), "ahead of" if behind < 0 else "behind"
+                )
+                snapshot.close()
+                snapshot = None
+        if snapshot is None:
+            if READ_MODEL_ENABLED:
+                read_model.load(db)
+            if AUTOCOMPLETE_INDEX_ENABLED:
+                autocomplete_index.load(db)
+            if SIMILAR_INDEX_ENABLED:
+                similar_index.load(db, background=True)
+        else:
+            if READ_MODEL_ENABLED:
+                read_model.load_snapshot(snapshot)
+            if AUTOCOMPLETE_INDEX_ENABLED:
+                autocomplete_index.load_snapshot(snapshot)
+            if SIMILAR_INDEX_ENABLED:
+                similar_index.load_snapshot(snapshot, background=True)
+            MovieService.replay_changes(db, snapshot.change_seq)
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+        sessions.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    manager = app.dependency_overrides.get(get_job_manager, get_job_manager)()
+    manager.recover()
+    warm_caches(app)
+    yield
+    manager.shutdown()
 
 def create_app() -> FastAPI:
     """Create and configure FastAPI application"""
     app = FastAPI(
+        lifespan=lifespan,
         title="Movies CRUD API",
         description="A comprehensive API for managing movies with CRUD operations",
         version="2.0.0",
@@ -13,6 +76,12 @@ def create_app() -> FastAPI:
         redoc_url="/redoc"
     )
     
+    # Serve repeated list/search responses from pre-rendered bytes
+    app.add_middleware(ResponseCacheMiddleware)
+    
+    # Trace sampled requests, cache hits included
+    app.add_middleware(TracingMiddleware)
+    
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -24,6 +93,8 @@ def create_app() -> FastAPI:
     
     # Include routers
     app.include_router(router)
+    app.include_router(jobs_router)
+    app.include_router(batch_router)
     
     # Root endpoint
     @app.get("/", tags=["root"])
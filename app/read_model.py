@@ -0,0 +1,236 @@
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from .database import Movie
+from .services import MovieService
+
+# Opt-in: hold the movies table in memory and answer analytics queries from it
+READ_MODEL_ENABLED = os.getenv("READ_MODEL_ENABLED", "false").lower() == "true"
+
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+
+def _to_f32(value: float) -> float:
+    """Round a Python float to the nearest float32"""
+    return array("f", [value])[0]
+
+def _f32_to_float(value: float) -> float:
+    """Shortest decimal that maps to the same float32 (8.69999980 -> 8.7)"""
+    for digits in range(1, 10):
+        candidate = float(f"{value:.{digits}g}")
+        if _to_f32(candidate) == value:
+            return candidate
+    return value
+
+class MovieReadModel:
+    """Column-oriented, in-process copy of the movies table.
+
+    Rows live in parallel typed arrays indexed by slot: year as int16, rating
+    as float32 and director as an index into an interned string table. A
+    sorted array of ``year << 32 | slot`` keys turns a year range into two
+    binary searches and a contiguous slice, so range scans never touch rows
+    outside the range. Aggregates are maintained incrementally on writes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop all data and mark the model as not loaded"""
+        with self._lock:
+            self.loaded = False
+            self.ids = array("q")
+            self.years = array("h")
+            self.ratings = array("f")
+            self.director_ids = array("l")
+            self.titles: List[Optional[str]] = []
+            self.directors: List[str] = []
+            self._director_index: Dict[str, int] = {}
+            self._slots: Dict[int, int] = {}
+            self._free: List[int] = []
+            self._year_index = array("q")
+            self._rating_sum = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def load(self, db: Session, batch_size: int = 10000) -> None:
+        """Replace the contents with a full scan of the movies table"""
+        with self._lock:
+            self.clear()
+            keys = []
+            rows = db.query(
+                Movie.id, Movie.title, Movie.director, Movie.year, Movie.rating
+            ).order_by(Movie.id).yield_per(batch_size)
+            for movie_id, title, director, year, rating in rows:
+                slot = len(self.ids)
+                self.ids.append(movie_id)
+                self.titles.append(title)
+                self.director_ids.append(self._intern(director))
+                self.years.append(year)
+                self.ratings.append(rating)
+                self._slots[movie_id] = slot
+                self._rating_sum += self.ratings[slot]
+                keys.append(year << _SLOT_BITS | slot)
+            keys.sort()
+            self._year_index = array("q", keys)
+            self.loaded = True
+
+    def load_snapshot(self, snapshot) -> None:
+        """Replace the contents with the columns of a warm-start snapshot (see app.snapshot)"""
+        with self._lock:
+            self.clear()
+            self.ids = snapshot.array("ids")
+            self.years = snapshot.array("years")
+            self.ratings = array("f", snapshot.column("ratings"))
+            self.director_ids = array("l", snapshot.column("director_ids"))
+            self.titles = snapshot.strings("title")
+            self.directors = snapshot.strings("dir")
+            self._director_index = {director: index for index, director in enumerate(self.directors)}
+            self._slots = {movie_id: slot for slot, movie_id in enumerate(self.ids)}
+            self._rating_sum = sum(self.ratings)
+            self._year_index = snapshot.array("year_index")
+            self.loaded = True
+
+    def apply(self, op: str, movie_id: int, values: Optional[dict]) -> None:
+        """MovieService change listener keeping the model in sync with writes"""
+        if not self.loaded:
+            return
+        with self._lock:
+            slot = self._slots.get(movie_id)
+            if slot is not None:
+                self._remove(slot)
+            if op == "delete":
+                if slot is not None:
+                    del self._slots[movie_id]
+                    self._free.append(slot)
+                return
+            if slot is None:
+                slot = self._free.pop() if self._free else self._allocate()
+                self._slots[movie_id] = slot
+            self.ids[slot] = movie_id
+            self.titles[slot] = values["title"]
+            self.director_ids[slot] = self._intern(values["director"])
+            self.years[slot] = values["year"]
+            self.ratings[slot] = values["rating"]
+            self._rating_sum += self.ratings[slot]
+            key = values["year"] << _SLOT_BITS | slot
+            self._year_index.insert(bisect_left(self._year_index, key), key)
+
+    def get(self, movie_id: int) -> Optional[dict]:
+        """Return one movie as a dict, or None if it is not in the model"""
+        with self._lock:
+            slot = self._slots.get(movie_id)
+            return None if slot is None else self._row(slot)
+
+    def year_range(
+        self,
+        start_year: int,
+        end_year: int,
+        min_rating: Optional[float] = None,
+        max_rating: Optional[float] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        """Movies released in [start_year, end_year], ordered by year"""
+        with self._lock:
+            slots = self._scan(start_year, end_year, min_rating, max_rating)
+            if fields:
+                getters = [(field, self._getters[field]) for field in fields]
+                return [{field: get(self, slot) for field, get in getters} for slot in slots]
+            return [self._row(slot) for slot in slots]
+
+    def stats(self) -> dict:
+        """Catalog aggregates, answered from running totals"""
+        with self._lock:
+            count = len(self._slots)
+            return {
+                "count": count,
+                "average_rating": round(self._rating_sum / count, 4) if count else None,
+                "min_year": self._year_index[0] >> _SLOT_BITS if count else None,
+                "max_year": self._year_index[-1] >> _SLOT_BITS if count else None,
+            }
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by each column and index"""
+        with self._lock:
+            def buffer_bytes(column: array) -> int:
+                return column.buffer_info()[1] * column.itemsize
+
+            return {
+                "rows": len(self._slots),
+                "ids": buffer_bytes(self.ids),
+                "years": buffer_bytes(self.years),
+                "ratings": buffer_bytes(self.ratings),
+                "director_ids": buffer_bytes(self.director_ids),
+                "year_index": buffer_bytes(self._year_index),
+                "titles": sys.getsizeof(self.titles)
+                + sum(sys.getsizeof(title) for title in self.titles if title is not None),
+                "directors": sys.getsizeof(self.directors)
+                + sum(sys.getsizeof(director) for director in self.directors),
+                "id_map": sys.getsizeof(self._slots),
+            }
+
+    def _scan(self, start_year, end_year, min_rating, max_rating) -> List[int]:
+        index = self._year_index
+        lo = bisect_left(index, start_year << _SLOT_BITS)
+        hi = bisect_left(index, (end_year + 1) << _SLOT_BITS)
+        slots = [key & _SLOT_MASK for key in index[lo:hi]]
+        if min_rating is not None:
+            floor = _to_f32(min_rating)
+            ratings = self.ratings
+            slots = [slot for slot in slots if ratings[slot] >= floor]
+        if max_rating is not None:
+            ceiling = _to_f32(max_rating)
+            ratings = self.ratings
+            slots = [slot for slot in slots if ratings[slot] <= ceiling]
+        return slots
+
+    _getters = {
+        "id": lambda self, slot: self.ids[slot],
+        "title": lambda self, slot: self.titles[slot],
+        "director": lambda self, slot: self.directors[self.director_ids[slot]],
+        "year": lambda self, slot: self.years[slot],
+        "rating": lambda self, slot: _f32_to_float(self.ratings[slot]),
+    }
+
+    def _row(self, slot: int) -> dict:
+        return {
+            "id": self.ids[slot],
+            "title": self.titles[slot],
+            "director": self.directors[self.director_ids[slot]],
+            "year": self.years[slot],
+            "rating": _f32_to_float(self.ratings[slot]),
+        }
+
+    def _intern(self, director: str) -> int:
+        index = self._director_index.get(director)
+        if index is None:
+            index = len(self.directors)
+            self.directors.append(director)
+            self._director_index[director] = index
+        return index
+
+    def _allocate(self) -> int:
+        self.ids.append(0)
+        self.titles.append(None)
+        self.director_ids.append(0)
+        self.years.append(0)
+        self.ratings.append(0.0)
+        return len(self.ids) - 1
+
+    def _remove(self, slot: int) -> None:
+        """Take a live slot out of the year index and the aggregates"""
+        key = self.years[slot] << _SLOT_BITS | slot
+        del self._year_index[bisect_left(self._year_index, key)]
+        self._rating_sum -= self.ratings[slot]
+        self.titles[slot] = None
+
+read_model = MovieReadModel()
+MovieService.subscribe(read_model.apply)
@@ -0,0 +1,172 @@
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from .services import MovieService
+
+# Cacheable routes and the query defaults that do not change their output
+CACHEABLE_ROUTES: Dict[str, Dict[str, str]] = {
+    "/movies/": {"skip": "0", "limit": "100"},
+    "/movies/search/year-range/": {},
+}
+
+# Seconds an entry is served for. Writes in this process invalidate entries
+# at once; writes from other workers, instances or app.dedup only show up
+# once the entry expires
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "1"))
+
+class CachedResponse(NamedTuple):
+    generation: int
+    body: bytes
+    etag: bytes
+    content_type: bytes
+    # time.monotonic() after which the entry is stale
+    expires: float = math.inf
+
+class ResponseCache:
+    """LRU store of encoded response bodies, bounded by entry count and bytes.
+
+    Each entry remembers the MovieService generation it was rendered at; an
+    entry from an older generation, or past its expiry, is treated as a miss
+    and dropped.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return a current entry for key, or None"""
+        entry = self._entries.get(key)
+        if entry is None or entry.generation != MovieService.generation or entry.expires <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store an entry, evicting least recently used ones to stay in bounds"""
+        if len(entry.body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.size += len(entry.body)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.size -= len(entry.body)
+
+def normalize_key(path: str, query_string: bytes) -> Optional[str]:
+    """Build the cache key for a request, or None if the route is not cacheable"""
+    defaults = CACHEABLE_ROUTES.get(path)
+    if defaults is None:
+        return None
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(query_string.decode("latin-1"))
+        if value != "" and defaults.get(name) != value
+    )
+    return f"{path}?{urlencode(params)}" if params else path
+
+def make_etag(body: bytes) -> bytes:
+    return b'"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+def _header(headers: Iterable[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving cached GET responses for list and search routes.
+
+    A hit is answered straight from stored bytes, before routing, so it never
+    opens a database session or runs any Pydantic serialisation.
+    """
+
+    def __init__(self, app, cache: Optional[ResponseCache] = None):
+        self.app = app
+        self.cache = cache if cache is not None else ResponseCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        key = normalize_key(scope["path"], scope.get("query_string", b""))
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = _header(scope["headers"], b"if-none-match")
+        entry = self.cache.get(key)
+        if entry is not None:
+            await self._send(send, entry, if_none_match, b"HIT")
+            return
+
+        # Capture the generation before rendering so a write that lands while
+        # the response is being built leaves the entry already stale.
+        generation = MovieService.generation
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+
+        body = b"".join(chunks)
+        if start["status"] != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+        entry = CachedResponse(
+            generation,
+            body,
+            make_etag(body),
+            _header(start["headers"], b"content-type") or b"application/json",
+            time.monotonic() + self.cache.ttl,
+        )
+        self.cache.put(key, entry)
+        await self._send(send, entry, if_none_match, b"MISS")
+
+    @staticmethod
+    async def _send(send, entry: CachedResponse, if_none_match, status: bytes):
+        headers = [(b"etag", entry.etag), (b"x-cache", status)]
+        if if_none_match is not None and entry.etag in (
+            tag.strip() for tag in if_none_match.split(b",")
+        ):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers += [
+            (b"content-type", entry.content_type),
+            (b"content-length", str(len(entry.body)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
@@ -1,61 +1,257 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from pydantic import ValidationError
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import json
+import re
+import time
 
+from .autocomplete import autocomplete_index
 from .database import get_db
-from .schemas import MovieCreate, MovieUpdate, MovieResponse, MovieListResponse
-from .services import MovieService
+from .read_model import read_model
+from .schemas import (
+    MovieCreate, MovieUpdate, MovieResponse, MovieListResponse,
+    MovieChangeResponse, MovieChangeListResponse, MovieBatchRequest, MovieBatchResponse,
+    MovieBulkRequest, MovieBulkResponse, AutocompleteResponse, SimilarMoviesResponse,
+    JobCreate, JobResponse, JOB_PARAMS, OnConflict, BatchOperation, BatchRequest, BatchResponse, parse_fields
+)
+from .jobs import FINISHED, JobManager, JobQueueFull, get_job_manager
+from .services import DuplicateMovieError, MovieService
+from .similar import similar_index
+from .singleflight import SingleFlight
+from .tracing import span
+
+# Identical concurrent reads share one query and one serialised payload. Keys
+# include MovieService.generation, so a read never joins a flight that started
+# before a write it should see; only the leader holds a threadpool thread.
+read_flight = SingleFlight()
 
 router = APIRouter(
     prefix="/movies",
     tags=["movies"]
 )
 
+def get_fields(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title")
+) -> Optional[List[str]]:
+    """Dependency parsing a sparse fieldset"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _render_movies(
+    db: Session,
+    skip: int,
+    limit: int,
+    title: Optional[str],
+    director: Optional[str],
+    fields: Optional[List[str]] = None
+) -> bytes:
+    """Query and serialise one page of the movie list"""
+    if title:
+        movies = MovieService.search_movies_by_title(db, title, skip, limit, fields)
+    elif director:
+        movies = MovieService.get_movies_by_director(db, director, skip, limit, fields)
+    else:
+        movies = MovieService.get_movies(db, skip, limit, fields)
+    
+    total = MovieService.get_movies_count(db)
+    
+    with span("serialize", movies=len(movies)):
+        if fields:
+            # Projected rows are already plain dicts; skip model validation entirely
+            return json.dumps(
+                {"movies": movies, "total": total, "skip": skip, "limit": limit},
+                separators=(",", ":")
+            ).encode()
+        
+        return MovieListResponse(
+            movies=movies,
+            total=total,
+            skip=skip,
+            limit=limit
+        ).model_dump_json().encode()
+
+def _render_movie(db: Session, movie_id: int) -> Optional[bytes]:
+    """Query and serialise a single movie, or None if it does not exist"""
+    movie = MovieService.get_movie(db, movie_id)
+    if movie is None:
+        return None
+    with span("serialize", movies=1):
+        return MovieResponse.model_validate(movie).model_dump_json().encode()
+
 @router.post("/", response_model=MovieResponse, status_code=201)
-def create_movie(movie: MovieCreate, db: Session = Depends(get_db)):
+def create_movie(
+    movie: MovieCreate,
+    response: Response,
+    on_conflict: OnConflict = Query("error", description="When the movie already exists: error, skip or update"),
+    db: Session = Depends(get_db)
+):
     """Create a new movie"""
     try:
-        return MovieService.create_movie(db, movie)
+        db_movie, status = MovieService.upsert_movie(db, movie, on_conflict)
+    except DuplicateMovieError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating movie: {str(e)}")
+    if status != "created":
+        response.status_code = 200
+    return db_movie
+
+@router.post("/bulk", response_model=MovieBulkResponse)
+def create_movies_bulk(
+    request: MovieBulkRequest,
+    on_conflict: OnConflict = Query("error", description="When a movie already exists: error, skip or update"),
+    db: Session = Depends(get_db)
+):
+    """Create many movies in one transaction"""
+    try:
+        results = MovieService.upsert_movies(db, request.movies, on_conflict)
+    except DuplicateMovieError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "index": e.index})
+    return {"results": [{"id": movie.id, "status": status} for movie, status in results]}
 
 @router.get("/", response_model=MovieListResponse)
-def read_movies(
+async def read_movies(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
     title: Optional[str] = Query(None, description="Search by title"),
     director: Optional[str] = Query(None, description="Filter by director"),
+    fields: Optional[List[str]] = Depends(get_fields),
     db: Session = Depends(get_db)
 ):
     """Get all movies with optional filtering and pagination"""
-    if title:
-        movies = MovieService.search_movies_by_title(db, title, skip, limit)
-    elif director:
-        movies = MovieService.get_movies_by_director(db, director, skip, limit)
-    else:
-        movies = MovieService.get_movies(db, skip, limit)
+    body = await read_flight.do_async(
+        ("movies", MovieService.generation, skip, limit, title, director, tuple(fields or ())),
+        lambda: _render_movies(db, skip, limit, title, director, fields)
+    )
+    return Response(content=body, media_type="application/json")
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+def autocomplete_movies(
+    q: str = Query(..., min_length=1, max_length=200, description="Prefix of a title or director word"),
+    limit: int = Query(10, ge=1, le=50, description="Number of suggestions to return"),
+    db: Session = Depends(get_db)
+):
+    """Suggest movies for a search box, ranked by rating"""
+    if autocomplete_index.loaded:
+        return {"suggestions": autocomplete_index.search(q, limit)}
+    return {"suggestions": MovieService.autocomplete_movies(db, q, limit)}
+
+@router.get("/stats")
+def get_movie_stats(db: Session = Depends(get_db)):
+    """Get catalog-wide aggregates"""
+    if read_model.loaded:
+        return read_model.stats()
+    return MovieService.get_movie_stats(db)
+
+def _stream_changes(db: Session, since: int, batch_size: int) -> Iterator[str]:
+    """Yield every change after since as NDJSON, fetching batch_size rows at a time"""
+    while True:
+        changes = MovieService.get_changes(db, since, batch_size)
+        for change in changes:
+            yield MovieChangeResponse.model_validate(change).model_dump_json() + "\n"
+        if len(changes) < batch_size:
+            return
+        since = changes[-1].seq
+
+@router.get("/changes", response_model=MovieChangeListResponse)
+async def read_changes(
+    since: int = Query(0, ge=0, description="Return changes with a sequence number greater than this"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of changes per batch"),
+    wait: float = Query(0, ge=0, le=30, description="Seconds to long-poll when there are no new changes"),
+    stream: bool = Query(False, description="Stream all changes since as NDJSON"),
+    db: Session = Depends(get_db)
+):
+    """Get movie changes after a sequence number for incremental sync.
     
-    total = MovieService.get_movies_count(db)
+    Long-polls wait on the event loop, so only the queries take a threadpool thread.
+    """
+    if stream:
+        return StreamingResponse(_stream_changes(db, since, limit), media_type="application/x-ndjson")
     
-    return MovieListResponse(
-        movies=movies,
-        total=total,
-        skip=skip,
-        limit=limit
+    deadline = time.monotonic() + wait
+    while True:
+        generation = MovieService.generation
+        changes = await run_in_threadpool(MovieService.get_changes, db, since, limit + 1)
+        remaining = deadline - time.monotonic()
+        if changes or remaining <= 0:
+            break
+        # Writes from other workers are not signalled here, so re-poll at least every second
+        await MovieService.wait_for_write_async(generation, min(remaining, 1.0))
+    
+    return MovieChangeListResponse(
+        changes=changes[:limit],
+        next_since=changes[:limit][-1].seq if changes else since,
+        has_more=len(changes) > limit
     )
 
+def _resolve_batch(db: Session, movie_ids: List[int]) -> MovieBatchResponse:
+    """Resolve IDs in order with one IN query.
+    
+    Not served from the read model: it keeps float32 ratings, and this must
+    return exactly what GET /movies/{id} does.
+    """
+    movie_ids = list(dict.fromkeys(movie_ids))
+    found = {movie.id: movie for movie in MovieService.get_movies_by_ids(db, movie_ids)}
+    return MovieBatchResponse(
+        movies=[found[movie_id] for movie_id in movie_ids if movie_id in found],
+        missing=[movie_id for movie_id in movie_ids if movie_id not in found]
+    )
+
+@router.get("/batch", response_model=MovieBatchResponse)
+def read_movies_batch(
+    ids: str = Query(..., description="Comma-separated movie IDs"),
+    db: Session = Depends(get_db)
+):
+    """Get several movies by ID in one request"""
+    try:
+        movie_ids = MovieBatchRequest(ids=[int(movie_id) for movie_id in ids.split(",") if movie_id.strip()]).ids
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ids: {str(e)}")
+    return _resolve_batch(db, movie_ids)
+
+@router.post("/batch", response_model=MovieBatchResponse)
+def read_movies_batch_post(request: MovieBatchRequest, db: Session = Depends(get_db)):
+    """Get several movies by ID, for ID lists too long for a query string"""
+    return _resolve_batch(db, request.ids)
+
 @router.get("/{movie_id}", response_model=MovieResponse)
-def read_movie(movie_id: int, db: Session = Depends(get_db)):
+async def read_movie(movie_id: int, db: Session = Depends(get_db)):
     """Get a specific movie by ID"""
-    movie = MovieService.get_movie(db, movie_id)
-    if movie is None:
+    body = await read_flight.do_async(
+        ("movie", MovieService.generation, movie_id), lambda: _render_movie(db, movie_id)
+    )
+    if body is None:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return movie
+    return Response(content=body, media_type="application/json")
+
+@router.get("/{movie_id}/similar", response_model=SimilarMoviesResponse)
+def read_similar_movies(
+    movie_id: int,
+    k: int = Query(10, ge=1, le=100, description="Number of similar movies to return")
+):
+    """Get the movies closest by director, decade, rating and title words"""
+    if not similar_index.loaded:
+        if not similar_index.building:
+            raise HTTPException(status_code=503, detail="Similarity index is not enabled")
+        raise HTTPException(status_code=503, detail="Similarity index is not ready", headers={"Retry-After": "5"})
+    similar = similar_index.similar(movie_id, k)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    return {"movie_id": movie_id, "similar": similar}
 
 @router.put("/{movie_id}", response_model=MovieResponse)
 def update_movie(movie_id: int, movie_update: MovieUpdate, db: Session = Depends(get_db)):
     """Update an existing movie"""
-    movie = MovieService.update_movie(db, movie_id, movie_update)
+    try:
+        movie = MovieService.update_movie(db, movie_id, movie_update)
+    except DuplicateMovieError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if movie is None:
         raise HTTPException(status_code=404, detail="Movie not found")
     return movie
@@ -72,11 +268,119 @@ def delete_movie(movie_id: int, db: Session = Depends(get_db)):
 def get_movies_by_year_range(
     start_year: int = Query(..., description="Start year"),
     end_year: int = Query(..., description="End year"),
+    min_rating: Optional[float] = Query(None, ge=0.0, le=10.0, description="Minimum rating"),
+    max_rating: Optional[float] = Query(None, ge=0.0, le=10.0, description="Maximum rating"),
+    fields: Optional[List[str]] = Depends(get_fields),
     db: Session = Depends(get_db)
 ):
     """Get movies within a specific year range"""
     if start_year > end_year:
         raise HTTPException(status_code=400, detail="Start year must be less than or equal to end year")
     
-    movies = MovieService.get_movies_by_year_range(db, start_year, end_year)
-    return {"movies": movies, "count": len(movies)}
\ No newline at end of file
+    if read_model.loaded:
+        movies = read_model.year_range(start_year, end_year, min_rating, max_rating, fields)
+    else:
+        movies = MovieService.get_movies_by_year_range(db, start_year, end_year, min_rating, max_rating, fields)
+    return {"movies": movies, "count": len(movies)}
+
+jobs_router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+@jobs_router.post("", response_model=JobResponse, status_code=202)
+def submit_job(request: JobCreate, manager: JobManager = Depends(get_job_manager)):
+    """Queue an export, import, dedup, stats or snapshot job"""
+    try:
+        params = JOB_PARAMS[request.kind].model_validate(request.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    try:
+        return manager.submit(request.kind, params.model_dump(exclude_unset=True))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+
+@jobs_router.get("/{job_id}", response_model=JobResponse)
+def read_job(job_id: int, manager: JobManager = Depends(get_job_manager)):
+    """Get a job's status, progress and result"""
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@jobs_router.post("/{job_id}/cancel", response_model=JobResponse, status_code=202)
+def cancel_job(job_id: int, manager: JobManager = Depends(get_job_manager)):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return manager.cancel(job_id)
+
+batch_router = APIRouter(tags=["batch"])
+
+_MOVIES_PATH = re.compile(r"^/movies/?$")
+_MOVIE_PATH = re.compile(r"^/movies/(\d+)$")
+
+def _run_operation(db: Session, operation: BatchOperation) -> Tuple[int, object]:
+    """Apply one batch operation without committing, returning (status, body).
+    
+    Mirrors the single-movie /movies routes; failures raise HTTPException.
+    """
+    url = urlsplit(operation.path)
+    movie_path = _MOVIE_PATH.match(url.path)
+    movie_id = int(movie_path.group(1)) if movie_path else None
+    if movie_id is None and not (_MOVIES_PATH.match(url.path) and operation.method == "POST"):
+        raise HTTPException(status_code=404, detail=f"No batchable route for {operation.method} {url.path}")
+    
+    try:
+        if operation.method == "POST":
+            if movie_id is not None:
+                raise HTTPException(status_code=405, detail="Method not allowed")
+            on_conflict = parse_qs(url.query).get("on_conflict", ["error"])[0]
+            if on_conflict not in ("error", "skip", "update"):
+                raise HTTPException(status_code=422, detail=f"Invalid on_conflict: {on_conflict}")
+            movie, status = MovieService.upsert_movie(db, MovieCreate(**(operation.body or {})), on_conflict, commit=False)
+            return (201 if status == "created" else 200), MovieResponse.model_validate(movie).model_dump()
+        if operation.method == "GET":
+            movie = MovieService.get_movie(db, movie_id)
+        elif operation.method == "PUT":
+            movie = MovieService.update_movie(db, movie_id, MovieUpdate(**(operation.body or {})), commit=False)
+        else:
+            if not MovieService.delete_movie(db, movie_id, commit=False):
+                raise HTTPException(status_code=404, detail="Movie not found")
+            return 200, {"message": "Movie deleted successfully"}
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except DuplicateMovieError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if movie is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    return 200, MovieResponse.model_validate(movie).model_dump()
+
+@batch_router.post("/batch", response_model=BatchResponse)
+def run_batch(request: BatchRequest, db: Session = Depends(get_db)):
+    """Run an ordered list of /movies operations in one transaction.
+    
+    Every operation sees the effects of the ones before it. If one fails,
+    the whole batch is rolled back and the response carries its index, its
+    error and the results of the operations before it (none of which were kept).
+    """
+    results = []
+    for index, operation in enumerate(request.operations):
+        try:
+            status, body = _run_operation(db, operation)
+        except HTTPException as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=e.status_code,
+                detail={"index": index, "error": e.detail, "results": results}
+            )
+        except Exception:
+            db.rollback()
+            raise
+        results.append({"status": status, "body": body})
+    db.commit()
+    return {"results": results}
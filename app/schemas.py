@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
+from typing import Any, List, Literal, Optional
 
 class MovieBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=200, description="Movie title")
@@ -16,13 +17,150 @@ class MovieUpdate(BaseModel):
     year: Optional[int] = Field(None, ge=1888, le=2030)
     rating: Optional[float] = Field(None, ge=0.0, le=10.0)
 
+# What to do when a created movie has the same dedup key as a stored one
+OnConflict = Literal["error", "skip", "update"]
+
 class MovieResponse(MovieBase):
     id: int
     
     model_config = {"from_attributes": True}
 
+# Fields a client may request through the fields= query parameter
+MOVIE_FIELDS = ("id", "title", "director", "year", "rating")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated sparse fieldset, keeping order and dropping repeats"""
+    if not fields:
+        return None
+    parsed = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in parsed if name not in MOVIE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return parsed or None
+
 class MovieListResponse(BaseModel):
     movies: list[MovieResponse]
     total: int
     skip: int
-    limit: int
\ No newline at end of file
+    limit: int
+
+class MovieBatchRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=1000, description="Movie IDs to resolve")
+
+class MovieBatchResponse(BaseModel):
+    movies: list[MovieResponse]
+    missing: list[int]
+
+class MovieBulkRequest(BaseModel):
+    movies: list[MovieCreate] = Field(..., min_length=1, max_length=1000, description="Movies to create")
+
+class MovieBulkResult(BaseModel):
+    id: int
+    status: Literal["created", "skipped", "updated"]
+
+class MovieBulkResponse(BaseModel):
+    results: list[MovieBulkResult]
+
+class MovieSuggestion(BaseModel):
+    id: int
+    title: str
+    director: str
+    rating: float
+    
+    model_config = {"from_attributes": True}
+
+class AutocompleteResponse(BaseModel):
+    suggestions: list[MovieSuggestion]
+
+class SimilarMovie(MovieResponse):
+    score: float
+
+class SimilarMoviesResponse(BaseModel):
+    movie_id: int
+    similar: list[SimilarMovie]
+
+class MovieChangeResponse(BaseModel):
+    seq: int
+    op: Literal["create", "update", "delete"]
+    movie_id: int
+    data: Optional[MovieResponse] = None
+    created_at: datetime
+    
+    model_config = {"from_attributes": True}
+
+class MovieChangeListResponse(BaseModel):
+    changes: list[MovieChangeResponse]
+    next_since: int
+    has_more: bool
+
+JobKind = Literal["export", "import", "dedup", "stats", "snapshot"]
+
+class JobCreate(BaseModel):
+    kind: JobKind
+    params: dict = Field(default_factory=dict, description="Kind-specific options, e.g. file or on_conflict")
+
+# Options each job kind accepts; unknown keys are rejected so typos don't pass silently
+class ExportParams(BaseModel):
+    file: Optional[str] = Field(None, min_length=1, description="Output file name in the job data directory")
+    
+    model_config = {"extra": "forbid"}
+
+class ImportParams(BaseModel):
+    movies: Optional[List[dict]] = None
+    file: Optional[str] = Field(None, min_length=1, description="NDJSON file name in the job data directory")
+    on_conflict: OnConflict = "skip"
+    
+    model_config = {"extra": "forbid"}
+    
+    @model_validator(mode="after")
+    def check_source(self):
+        if (self.movies is None) == (self.file is None):
+            raise ValueError("Give exactly one of movies or file")
+        return self
+
+class DedupParams(BaseModel):
+    batch_size: int = Field(1000, ge=1)
+    dry_run: bool = False
+    
+    model_config = {"extra": "forbid"}
+
+class NoParams(BaseModel):
+    model_config = {"extra": "forbid"}
+
+JOB_PARAMS = {
+    "export": ExportParams,
+    "import": ImportParams,
+    "dedup": DedupParams,
+    "stats": NoParams,
+    "snapshot": NoParams,
+}
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    params: dict
+    progress: float
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    model_config = {"from_attributes": True}
+
+class BatchOperation(BaseModel):
+    method: Literal["GET", "POST", "PUT", "DELETE"]
+    path: str = Field(..., description="A /movies route, e.g. /movies/ or /movies/42?on_conflict=skip")
+    body: Optional[dict] = None
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=100)
+
+class BatchResult(BaseModel):
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    results: list[BatchResult]
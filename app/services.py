@@ -1,18 +1,254 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .database import Movie
-from .schemas import MovieCreate, MovieUpdate
-from typing import List, Optional
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from .database import Movie, MovieChange
+from .schemas import MovieCreate, MovieUpdate, OnConflict
+from .text import normalize
+from .tracing import trace_methods
+from typing import Callable, List, Optional, Sequence, Set, Tuple, Union
+import asyncio
+import threading
 
+# Called as listener(op, movie_id, values) once the write has been committed
+ChangeListener = Callable[[str, int, Optional[dict]], None]
+
+_listeners: List[ChangeListener] = []
+# Coroutines in wait_for_write_async, woken on their own event loop. The lock
+# also covers the generation bump, so a waiter cannot miss a write
+_waiters_lock = threading.Lock()
+_async_waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+# Held by every transaction that writes to the change log on PostgreSQL
+CHANGE_LOG_LOCK = 0x6D6F7669
+
+# Columns that make up the dedup key
+IDENTITY_FIELDS = ("title", "director", "year")
+
+class DuplicateMovieError(Exception):
+    """A write would store a second movie with the same dedup key"""
+    
+    def __init__(self, dedup_key: str, index: Optional[int] = None):
+        super().__init__("A movie with the same title, director and year already exists")
+        self.dedup_key = dedup_key
+        # Position in a bulk request, when the duplicate came from one
+        self.index = index
+
+def dedup_key(title: str, director: str, year: int) -> str:
+    """Key under which spelling variants of the same movie collide"""
+    return f"{normalize(title)}|{normalize(director)}|{year}"
+
+def _like_escape(text: str) -> str:
+    """Escape LIKE wildcards so text matches literally; the escape character is a backslash"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _insert(db: Session):
+    """INSERT for the session's dialect; both provide ON CONFLICT"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(Movie)
+    return sqlite.insert(Movie)
+
+def _upsert(db: Session, movie: MovieCreate, on_conflict: OnConflict) -> Tuple[Movie, str]:
+    """INSERT ... ON CONFLICT (dedup_key) for one movie, without committing.
+    
+    Returns the stored movie and "created", "skipped" or "updated".
+    """
+    values = movie.model_dump()
+    key = values["dedup_key"] = dedup_key(movie.title, movie.director, movie.year)
+    statement = _insert(db).values(**values)
+    
+    if on_conflict == "update":
+        # Only used to label the change; the upsert itself is a single statement
+        exists = db.query(Movie.id).filter(Movie.dedup_key == key).first() is not None
+        statement = statement.on_conflict_do_update(
+            index_elements=[Movie.dedup_key],
+            set_={name: statement.excluded[name] for name in ("title", "director", "year", "rating")}
+        )
+    else:
+        exists = False
+        statement = statement.on_conflict_do_nothing(index_elements=[Movie.dedup_key])
+    
+    db_movie = db.execute(
+        statement.returning(Movie), execution_options={"populate_existing": True}
+    ).scalar_one_or_none()
+    if db_movie is None:
+        if on_conflict == "error":
+            raise DuplicateMovieError(key)
+        return db.query(Movie).filter(Movie.dedup_key == key).one(), "skipped"
+    
+    op = "update" if exists else "create"
+    _record_change(db, op, db_movie.id, _movie_values(db_movie))
+    return db_movie, "updated" if exists else "created"
+
+def _movie_values(movie: Movie) -> dict:
+    """Column values of a movie as a plain dict"""
+    return {
+        "id": movie.id,
+        "title": movie.title,
+        "director": movie.director,
+        "year": movie.year,
+        "rating": movie.rating,
+    }
+
+def _select(db: Session, fields: Optional[Sequence[str]]):
+    """Query whole movies, or only the given columns when fields is set"""
+    if fields:
+        return db.query(*[getattr(Movie, field) for field in fields])
+    return db.query(Movie)
+
+def _fetch(query, fields: Optional[Sequence[str]]) -> List[Union[Movie, dict]]:
+    """Run a query built by _select; projected rows come back as dicts"""
+    if fields:
+        return [row._asdict() for row in query]
+    return query.all()
+
+def _record_change(db: Session, op: str, movie_id: int, values: Optional[dict] = None) -> None:
+    """Log a change in the current transaction and queue it for listeners.
+    
+    The change-log row commits or rolls back together with the write, and
+    listeners are only notified once the session commits.
+    
+    PostgreSQL hands out sequence numbers before commit, so concurrent
+    transactions could commit them out of order and a reader at since=N
+    would never see a lower seq committed later. Writers therefore hold a
+    transaction-scoped advisory lock from their first change until commit,
+    making seq order commit order. SQLite already serialises writers.
+    """
+    if not db.info.get("movie_changes") and db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK)))
+    db.add(MovieChange(movie_id=movie_id, op=op, data=values))
+    db.info.setdefault("movie_changes", []).append((op, movie_id, values))
+
+def _end_write(db: Session, commit: bool) -> None:
+    """Commit a write, or with commit=False flush it and leave the transaction to the caller.
+    
+    Listeners hear about uncommitted writes once the caller commits; if it
+    rolls back instead, they never do.
+    """
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    changes = session.info.pop("movie_changes", None)
+    if changes:
+        _publish(changes)
+
+def _publish(changes: List[Tuple[str, int, Optional[dict]]]) -> None:
+    # Bump the generation only once listeners have applied the changes, so
+    # nothing rendered from a half-updated cache is stored under the new one
+    try:
+        for change in changes:
+            for listener in list(_listeners):
+                listener(*change)
+    finally:
+        with _waiters_lock:
+            MovieService.generation += 1
+            for loop, waiter in _async_waiters:
+                try:
+                    loop.call_soon_threadsafe(waiter.set)
+                except RuntimeError:
+                    # The waiter's loop has been closed
+                    pass
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop("movie_changes", None)
+
+@trace_methods
 class MovieService:
+    # Bumped after every committed write, once listeners have run; in-process caches compare against it
+    generation = 0
+    
     @staticmethod
-    def create_movie(db: Session, movie: MovieCreate) -> Movie:
-        """Create a new movie"""
-        db_movie = Movie(**movie.model_dump())
-        db.add(db_movie)
-        db.commit()
-        db.refresh(db_movie)
-        return db_movie
+    def subscribe(listener: ChangeListener) -> None:
+        """Register a callback for committed movie writes"""
+        _listeners.append(listener)
+    
+    @staticmethod
+    def unsubscribe(listener: ChangeListener) -> None:
+        """Remove a callback registered with subscribe"""
+        if listener in _listeners:
+            _listeners.remove(listener)
+    
+    @staticmethod
+    async def wait_for_write_async(generation: int, timeout: float) -> bool:
+        """Wait without blocking a thread until a write is committed after generation, or timeout"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with _waiters_lock:
+            if MovieService.generation != generation:
+                return True
+            _async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with _waiters_lock:
+                _async_waiters.discard(waiter)
+    
+    @staticmethod
+    def get_changes(db: Session, since: int = 0, limit: int = 500) -> List[MovieChange]:
+        """Get change-log entries with a sequence number greater than since"""
+        return db.query(MovieChange).filter(
+            MovieChange.seq > since
+        ).order_by(MovieChange.seq).limit(limit).all()
+    
+    @staticmethod
+    def last_change_seq(db: Session) -> int:
+        """Sequence number of the newest change-log entry, or 0"""
+        return db.query(func.max(MovieChange.seq)).scalar() or 0
+    
+    @staticmethod
+    def replay_changes(db: Session, since: int, batch_size: int = 1000) -> int:
+        """Publish logged changes after since to listeners; returns the last seq replayed.
+        
+        For writes committed by another process, whose listeners ran there.
+        Listeners apply changes idempotently, so replaying one twice is harmless.
+        """
+        while True:
+            changes = MovieService.get_changes(db, since, batch_size)
+            if not changes:
+                return since
+            _publish([(change.op, change.movie_id, change.data) for change in changes])
+            since = changes[-1].seq
+    
+    @staticmethod
+    def create_movie(db: Session, movie: MovieCreate, commit: bool = True) -> Movie:
+        """Create a new movie, raising DuplicateMovieError if it already exists"""
+        return MovieService.upsert_movie(db, movie, "error", commit)[0]
+    
+    @staticmethod
+    def upsert_movie(
+        db: Session, movie: MovieCreate, on_conflict: OnConflict = "error", commit: bool = True
+    ) -> Tuple[Movie, str]:
+        """Create a movie, or on a dedup key conflict raise, skip or overwrite it"""
+        result = _upsert(db, movie, on_conflict)
+        _end_write(db, commit)
+        return result
+    
+    @staticmethod
+    def upsert_movies(
+        db: Session, movies: Sequence[MovieCreate], on_conflict: OnConflict = "error", commit: bool = True
+    ) -> List[Tuple[Movie, str]]:
+        """Create many movies in one transaction with per-row conflict handling.
+        
+        With on_conflict="error" the first duplicate rolls back the whole batch.
+        """
+        results = []
+        for index, movie in enumerate(movies):
+            try:
+                results.append(_upsert(db, movie, on_conflict))
+            except DuplicateMovieError as e:
+                if commit:
+                    db.rollback()
+                e.index = index
+                raise
+        _end_write(db, commit)
+        return results
     
     @staticmethod
     def get_movie(db: Session, movie_id: int) -> Optional[Movie]:
@@ -20,9 +256,22 @@ class MovieService:
         return db.query(Movie).filter(Movie.id == movie_id).first()
     
     @staticmethod
-    def get_movies(db: Session, skip: int = 0, limit: int = 100) -> List[Movie]:
+    def get_movies_by_ids(db: Session, movie_ids: Sequence[int]) -> List[Movie]:
+        """Get the movies with the given IDs in one IN query, in the order requested"""
+        if not movie_ids:
+            return []
+        found = {
+            movie.id: movie
+            for movie in db.query(Movie).filter(Movie.id.in_(set(movie_ids)))
+        }
+        return [found[movie_id] for movie_id in movie_ids if movie_id in found]
+    
+    @staticmethod
+    def get_movies(
+        db: Session, skip: int = 0, limit: int = 100, fields: Optional[Sequence[str]] = None
+    ) -> List[Union[Movie, dict]]:
         """Get all movies with pagination"""
-        return db.query(Movie).offset(skip).limit(limit).all()
+        return _fetch(_select(db, fields).offset(skip).limit(limit), fields)
     
     @staticmethod
     def get_movies_count(db: Session) -> int:
@@ -30,49 +279,125 @@ class MovieService:
         return db.query(func.count(Movie.id)).scalar()
     
     @staticmethod
-    def update_movie(db: Session, movie_id: int, movie_update: MovieUpdate) -> Optional[Movie]:
-        """Update an existing movie"""
-        db_movie = db.query(Movie).filter(Movie.id == movie_id).first()
+    def update_movie(
+        db: Session, movie_id: int, movie_update: MovieUpdate, commit: bool = True
+    ) -> Optional[Movie]:
+        """Update an existing movie with a single UPDATE ... RETURNING"""
+        update_data = movie_update.model_dump(exclude_unset=True)
+        if not update_data:
+            return MovieService.get_movie(db, movie_id)
+        
+        db_movie = db.execute(
+            update(Movie).where(Movie.id == movie_id).values(**update_data).returning(Movie)
+        ).scalar_one_or_none()
         if not db_movie:
             return None
         
-        update_data = movie_update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_movie, field, value)
+        if update_data.keys() & IDENTITY_FIELDS:
+            key = dedup_key(db_movie.title, db_movie.director, db_movie.year)
+            if key != db_movie.dedup_key:
+                try:
+                    db.execute(update(Movie).where(Movie.id == movie_id).values(dedup_key=key))
+                except IntegrityError:
+                    if commit:
+                        db.rollback()
+                    raise DuplicateMovieError(key)
         
-        db.commit()
-        db.refresh(db_movie)
+        _record_change(db, "update", movie_id, _movie_values(db_movie))
+        _end_write(db, commit)
         return db_movie
     
     @staticmethod
-    def delete_movie(db: Session, movie_id: int) -> bool:
-        """Delete a movie by ID"""
-        db_movie = db.query(Movie).filter(Movie.id == movie_id).first()
-        if not db_movie:
+    def delete_movie(db: Session, movie_id: int, commit: bool = True) -> bool:
+        """Delete a movie by ID with a single DELETE ... RETURNING"""
+        deleted = db.execute(
+            delete(Movie).where(Movie.id == movie_id).returning(Movie.id)
+        ).first()
+        if not deleted:
             return False
         
-        db.delete(db_movie)
-        db.commit()
+        _record_change(db, "delete", movie_id)
+        _end_write(db, commit)
         return True
     
     @staticmethod
-    def search_movies_by_title(db: Session, title: str, skip: int = 0, limit: int = 100) -> List[Movie]:
+    def search_movies_by_title(
+        db: Session, title: str, skip: int = 0, limit: int = 100, fields: Optional[Sequence[str]] = None
+    ) -> List[Union[Movie, dict]]:
         """Search movies by title"""
-        return db.query(Movie).filter(
+        return _fetch(_select(db, fields).filter(
             Movie.title.ilike(f"%{title}%")
-        ).offset(skip).limit(limit).all()
+        ).offset(skip).limit(limit), fields)
     
     @staticmethod
-    def get_movies_by_director(db: Session, director: str, skip: int = 0, limit: int = 100) -> List[Movie]:
-        """Get movies by director"""
+    def autocomplete_movies(db: Session, prefix: str, limit: int = 10) -> List[Movie]:
+        """Get the highest-rated movies with a title or director word starting with prefix.
+        
+        Matches as AutocompleteIndex.search does, against the normalised
+        "title|director|year" dedup key: the start of the title, any word
+        after a space, or the start of the director (the "|" that follows
+        it keeps the year out). Rows without a key yet are matched on
+        their raw columns at the start or after a space.
+        """
+        text = normalize(prefix)
+        if not text:
+            return []
+        pattern = _like_escape(text)
+        keyed = or_(
+            Movie.dedup_key.like(f"{pattern}%", escape="\\"),
+            Movie.dedup_key.like(f"% {pattern}%", escape="\\"),
+            Movie.dedup_key.like(f"%|{pattern}%|%", escape="\\"),
+        )
+        unkeyed = and_(Movie.dedup_key.is_(None), or_(*[
+            column.ilike(word_start, escape="\\")
+            for column in (Movie.title, Movie.director)
+            for word_start in (f"{pattern}%", f"% {pattern}%")
+        ]))
         return db.query(Movie).filter(
+            or_(keyed, unkeyed)
+        ).order_by(Movie.rating.desc(), Movie.id).limit(limit).all()
+    
+    @staticmethod
+    def get_movies_by_director(
+        db: Session, director: str, skip: int = 0, limit: int = 100, fields: Optional[Sequence[str]] = None
+    ) -> List[Union[Movie, dict]]:
+        """Get movies by director"""
+        return _fetch(_select(db, fields).filter(
             Movie.director.ilike(f"%{director}%")
-        ).offset(skip).limit(limit).all()
+        ).offset(skip).limit(limit), fields)
     
     @staticmethod
-    def get_movies_by_year_range(db: Session, start_year: int, end_year: int) -> List[Movie]:
-        """Get movies within a year range"""
-        return db.query(Movie).filter(
+    def get_movies_by_year_range(
+        db: Session,
+        start_year: int,
+        end_year: int,
+        min_rating: Optional[float] = None,
+        max_rating: Optional[float] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Union[Movie, dict]]:
+        """Get movies within a year range, optionally bounded by rating"""
+        query = _select(db, fields).filter(
             Movie.year >= start_year,
             Movie.year <= end_year
-        ).all()
\ No newline at end of file
+        )
+        if min_rating is not None:
+            query = query.filter(Movie.rating >= min_rating)
+        if max_rating is not None:
+            query = query.filter(Movie.rating <= max_rating)
+        return _fetch(query, fields)
+    
+    @staticmethod
+    def get_movie_stats(db: Session) -> dict:
+        """Get catalog-wide aggregates"""
+        count, average, min_year, max_year = db.query(
+            func.count(Movie.id),
+            func.avg(Movie.rating),
+            func.min(Movie.year),
+            func.max(Movie.year)
+        ).one()
+        return {
+            "count": count,
+            "average_rating": round(average, 4) if average is not None else None,
+            "min_year": min_year,
+            "max_year": max_year,
+        }
\ No newline at end of file
@@ -0,0 +1,280 @@
+import heapq
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .database import Movie, make_engine
+from .services import MovieService
+from .snapshot import Snapshot
+from .text import normalize
+
+logger = logging.getLogger(__name__)
+
+# Build the similarity index at startup; the endpoint answers 503 until it is ready.
+# Off by default: every worker holds its own features and postings for every movie
+SIMILAR_INDEX_ENABLED = os.getenv("SIMILAR_INDEX_ENABLED", "false").lower() == "true"
+
+# Catalogs smaller than this are indexed inline instead of in a worker process
+INLINE_BUILD_ROWS = 50000
+# Title tokens and directors with more movies than this are too common to
+# be useful for generating candidates (they still count when scoring)
+MAX_POSTING = 5000
+# Movies taken from either side of the rating order in the same and adjacent decades
+DECADE_NEIGHBOURS = 50
+MAX_CACHED = 10000
+
+WEIGHTS = {"director": 0.35, "title": 0.35, "decade": 0.15, "rating": 0.15}
+STOPWORDS = frozenset({"a", "an", "and", "de", "el", "in", "la", "le", "of", "on", "the", "to"})
+
+Row = Tuple[int, str, str, int, float]
+
+def title_tokens(title: str) -> Tuple[str, ...]:
+    """Distinct normalised title words, without stopwords"""
+    return tuple(sorted({
+        token for token in normalize(title).split(" ")
+        if token and token not in STOPWORDS
+    }))
+
+def _decade_key(movie_id: int, rating: float) -> int:
+    return round(rating * 100) << 32 | movie_id
+
+def _index_features(state: dict, movie_id: int, title: str, director: str, year: int, rating: float) -> None:
+    tokens = title_tokens(title)
+    state["movies"][movie_id] = (title, director, year, rating, tokens)
+    state["by_director"].setdefault(director, set()).add(movie_id)
+    for token in tokens:
+        state["by_token"].setdefault(token, set()).add(movie_id)
+
+def _add(state: dict, movie_id: int, title: str, director: str, year: int, rating: float) -> None:
+    _index_features(state, movie_id, title, director, year, rating)
+    decade = state["by_decade"].setdefault(year // 10, array("q"))
+    key = _decade_key(movie_id, rating)
+    decade.insert(bisect_left(decade, key), key)
+
+def _remove(state: dict, movie_id: int) -> None:
+    title, director, year, rating, tokens = state["movies"].pop(movie_id)
+    state["by_director"][director].discard(movie_id)
+    for token in tokens:
+        state["by_token"][token].discard(movie_id)
+    decade = state["by_decade"][year // 10]
+    del decade[bisect_left(decade, _decade_key(movie_id, rating))]
+
+def build_state(rows: Iterable[Row]) -> dict:
+    """Build features and postings from (id, title, director, year, rating) rows.
+
+    Runs in a worker process for large catalogs, so it only returns plain,
+    picklable containers.
+    """
+    state = {"movies": {}, "by_director": {}, "by_token": {}, "by_decade": {}}
+    keys: Dict[int, list] = {}
+    for movie_id, title, director, year, rating in rows:
+        _index_features(state, movie_id, title, director, year, rating)
+        keys.setdefault(year // 10, []).append(_decade_key(movie_id, rating))
+    state["by_decade"] = {decade: array("q", sorted(values)) for decade, values in keys.items()}
+    return state
+
+def _scan(db: Session) -> Iterable[Row]:
+    return db.query(
+        Movie.id, Movie.title, Movie.director, Movie.year, Movie.rating
+    ).yield_per(10000)
+
+def build_state_from_database(database_url: str) -> dict:
+    """build_state over a scan of the movies table, run in the worker process"""
+    engine = make_engine(database_url)
+    try:
+        with Session(engine) as db:
+            return build_state(_scan(db))
+    finally:
+        engine.dispose()
+
+def build_state_from_snapshot(path: str) -> dict:
+    """build_state over the rows of a snapshot file, run in the worker process"""
+    snapshot = Snapshot(path)
+    try:
+        return build_state(snapshot.movies())
+    finally:
+        snapshot.close()
+
+class SimilarityIndex:
+    """Nearest-neighbour index over director, decade, rating and title words.
+
+    Per-movie features and inverted postings (director -> movies, title word
+    -> movies, decade -> movies sorted by rating) are precomputed, so a
+    query only scores the candidates that share something with the movie:
+    its director, its less common title words, and the closest ratings in
+    its own and the adjacent decades. Title overlap is a TF-IDF cosine over distinct words.
+    Results are cached per movie until the next write.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.loaded = False
+            self.building = False
+            self._state = build_state([])
+            self._pending: List[Tuple[str, int, Optional[dict]]] = []
+            self._cache: Dict[Tuple[int, int], List[Tuple[int, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._state["movies"])
+
+    def load(self, db: Session, background: bool = False) -> Optional[Future]:
+        """Rebuild from the movies table.
+
+        With background=True and a large catalog, the scan and the build
+        both run in a separate process, which installs the result when it
+        is ready; writes made in the meantime are queued and replayed on
+        top. Only unpickling the finished state happens in this process.
+        """
+        if background and MovieService.get_movies_count(db) >= INLINE_BUILD_ROWS:
+            url = db.get_bind().engine.url.render_as_string(hide_password=False)
+            return self._build_in_background(build_state_from_database, url)
+        self.load_rows(_scan(db))
+        return None
+
+    def load_snapshot(self, snapshot: Snapshot, background: bool = False) -> Optional[Future]:
+        """Rebuild from the rows of a warm-start snapshot, as load does from the table"""
+        if background and snapshot.rows >= INLINE_BUILD_ROWS:
+            return self._build_in_background(build_state_from_snapshot, snapshot.path)
+        self.load_rows(snapshot.movies())
+        return None
+
+    def load_rows(self, rows: Iterable[Row]) -> None:
+        """Rebuild inline from (id, title, director, year, rating) rows"""
+        with self._lock:
+            self._pending = []
+            self._install(build_state(rows))
+
+    def _build_in_background(self, build: Callable[[str], dict], source: str) -> Future:
+        with self._lock:
+            self.building = True
+            self._pending = []
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        future = executor.submit(build, source)
+        future.add_done_callback(lambda done: self._finish_build(done, executor))
+        return future
+
+    def _finish_build(self, future: Future, executor: ProcessPoolExecutor) -> None:
+        try:
+            state = future.result()
+        except Exception:
+            logger.exception("Building the similarity index failed")
+            with self._lock:
+                self.building = False
+            return
+        finally:
+            executor.shutdown(wait=False)
+        with self._lock:
+            self._install(state)
+
+    def _install(self, state: dict) -> None:
+        self._state = state
+        self._cache.clear()
+        for change in self._pending:
+            self._apply(*change)
+        self._pending = []
+        self.building = False
+        self.loaded = True
+
+    def apply(self, op: str, movie_id: int, values: Optional[dict]) -> None:
+        """MovieService change listener keeping the index in sync with writes"""
+        with self._lock:
+            if self.building:
+                self._pending.append((op, movie_id, values))
+            elif self.loaded:
+                self._apply(op, movie_id, values)
+
+    def _apply(self, op: str, movie_id: int, values: Optional[dict]) -> None:
+        self._cache.clear()
+        if movie_id in self._state["movies"]:
+            _remove(self._state, movie_id)
+        if op != "delete":
+            _add(self._state, movie_id, values["title"], values["director"], values["year"], values["rating"])
+
+    def similar(self, movie_id: int, k: int = 10) -> Optional[List[dict]]:
+        """The k movies most similar to movie_id, best first, or None if it is unknown"""
+        with self._lock:
+            if movie_id not in self._state["movies"]:
+                return None
+            neighbours = self._cache.get((movie_id, k))
+            if neighbours is None:
+                neighbours = self._neighbours(movie_id, k)
+                if len(self._cache) >= MAX_CACHED:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[(movie_id, k)] = neighbours
+            movies = self._state["movies"]
+            return [
+                {
+                    "id": other_id,
+                    "title": movies[other_id][0],
+                    "director": movies[other_id][1],
+                    "year": movies[other_id][2],
+                    "rating": movies[other_id][3],
+                    "score": round(score, 4),
+                }
+                for other_id, score in neighbours
+            ]
+
+    def _candidates(self, movie_id: int) -> Set[int]:
+        state = self._state
+        title, director, year, rating, tokens = state["movies"][movie_id]
+        candidates: Set[int] = set()
+        same_director = state["by_director"][director]
+        if len(same_director) <= MAX_POSTING:
+            candidates |= same_director
+        for token in tokens:
+            posting = state["by_token"][token]
+            if len(posting) <= MAX_POSTING:
+                candidates |= posting
+        key = _decade_key(movie_id, rating)
+        for decade_number in (year // 10 - 1, year // 10, year // 10 + 1):
+            decade = state["by_decade"].get(decade_number)
+            if not decade:
+                continue
+            position = bisect_left(decade, key)
+            for other in decade[max(position - DECADE_NEIGHBOURS, 0):position + DECADE_NEIGHBOURS + 1]:
+                candidates.add(other & 0xFFFFFFFF)
+        candidates.discard(movie_id)
+        return candidates
+
+    def _neighbours(self, movie_id: int, k: int) -> List[Tuple[int, float]]:
+        state = self._state
+        movies = state["movies"]
+        _, director, year, rating, tokens = movies[movie_id]
+        total = max(len(movies), 1)
+        idf = {token: math.log(1 + total / len(state["by_token"][token])) for token in tokens}
+        norm = math.sqrt(sum(weight * weight for weight in idf.values())) or 1.0
+
+        def score(other_id: int) -> float:
+            _, other_director, other_year, other_rating, other_tokens = movies[other_id]
+            shared = sum(idf[token] ** 2 for token in other_tokens if token in idf)
+            title_score = 0.0
+            if shared:
+                other_norm = math.sqrt(sum(
+                    math.log(1 + total / len(state["by_token"][token])) ** 2
+                    for token in other_tokens
+                ))
+                title_score = shared / (norm * other_norm)
+            return (
+                WEIGHTS["director"] * (other_director == director)
+                + WEIGHTS["title"] * title_score
+                + WEIGHTS["decade"] * max(1 - abs(other_year // 10 - year // 10) / 2, 0)
+                + WEIGHTS["rating"] * (1 - abs(other_rating - rating) / 10)
+            )
+
+        scored = ((score(other_id), -other_id) for other_id in self._candidates(movie_id))
+        return [(-negative_id, value) for value, negative_id in heapq.nlargest(k, scored)]
+
+similar_index = SimilarityIndex()
+MovieService.subscribe(similar_index.apply)
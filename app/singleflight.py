@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls onto one execution.
+
+    The first caller for a key (the leader) runs the function; every caller
+    that arrives with the same key while the leader is still running waits
+    for and receives the leader's result (or exception). Nothing is cached
+    once the call finishes, so the next request after completion runs again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return the in-flight future for key and whether we are its leader"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> Any:
+        """Run fn as the leader and publish its outcome to all waiters"""
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn once for all concurrent callers of key (blocking)"""
+        future, leader = self._join(key)
+        if leader:
+            return self._finish(key, future, fn)
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Async variant of do; fn is a blocking callable run in the threadpool.
+
+        Sync and async callers share the same in-flight calls, so a request
+        served by a threadpool handler and one served by a coroutine handler
+        for the same key still collapse onto a single execution.
+        """
+        future, leader = self._join(key)
+        if leader:
+            return await run_in_threadpool(self._finish, key, future, fn)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed"""
+        with self._lock:
+            return len(self._calls)
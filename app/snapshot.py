@@ -0,0 +1,241 @@
+"""
+Write a warm-start snapshot of the in-process read model and indexes.
+
+Usage: python -m app.snapshot [path]   (default: $SNAPSHOT_PATH)
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from .autocomplete import MAX_KEY_BYTES, AutocompleteIndex
+from .database import Movie, SessionLocal, create_tables
+from .services import MovieService
+
+logger = logging.getLogger(__name__)
+
+# Load in-process caches from this file at startup when it exists
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
+# A snapshot further behind than this many changes is ignored: replaying
+# them would take longer than scanning the table
+SNAPSHOT_MAX_REPLAY = int(os.getenv("SNAPSHOT_MAX_REPLAY", "1000"))
+
+MAGIC = b"MOVSNAP\0"
+VERSION = 1
+
+# magic, version, change seq, row count, section count
+_HEADER = struct.Struct("<8sIQQI")
+# name, array typecode, offset, length in bytes
+_SECTION = struct.Struct("<16sc7xQQ")
+_ALIGN = 8
+
+Section = Union[array, bytes]
+
+class SnapshotError(Exception):
+    """The file is not a snapshot this version can read"""
+
+def _pack_strings(values: Sequence[str]) -> Tuple[array, bytes]:
+    """Offsets (in characters, n + 1 of them) and the UTF-8 of all values joined"""
+    offsets = array("q", [0])
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return offsets, "".join(values).encode()
+
+def _pack_bytes(values: Sequence[bytes]) -> Tuple[array, bytes]:
+    offsets = array("q", [0])
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return offsets, b"".join(values)
+
+def write_snapshot(db: Session, path: str, batch_size: int = 10000) -> dict:
+    """Scan the movies table and atomically write a snapshot to path.
+
+    The change sequence is read before the scan, so writes racing with it
+    are replayed again on load; listeners apply changes idempotently.
+    """
+    change_seq = MovieService.last_change_seq(db)
+    ids, years, ratings, director_ids = array("q"), array("h"), array("d"), array("i")
+    titles: List[str] = []
+    directors: List[str] = []
+    director_index: Dict[str, int] = {}
+    rows = db.query(
+        Movie.id, Movie.title, Movie.director, Movie.year, Movie.rating
+    ).order_by(Movie.id).yield_per(batch_size)
+    for movie_id, title, director, year, rating in rows:
+        ids.append(movie_id)
+        titles.append(title)
+        years.append(year)
+        ratings.append(rating)
+        if director not in director_index:
+            director_index[director] = len(directors)
+            directors.append(director)
+        director_ids.append(director_index[director])
+
+    # Slots are row positions, as in MovieReadModel.load
+    year_index = array("q", sorted(year << 32 | slot for slot, year in enumerate(years)))
+    autocomplete = AutocompleteIndex()
+    autocomplete.load_rows(
+        (movie_id, titles[slot], directors[director_ids[slot]], ratings[slot])
+        for slot, movie_id in enumerate(ids)
+    )
+
+    title_offsets, title_data = _pack_strings(titles)
+    director_offsets, director_data = _pack_strings(directors)
+    key_offsets, key_data = _pack_bytes(autocomplete._keys)
+    meta = {
+        "byteorder": sys.byteorder,
+        "max_key_bytes": MAX_KEY_BYTES,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    sections: Dict[str, Section] = {
+        "meta": json.dumps(meta).encode(),
+        "ids": ids,
+        "years": years,
+        "ratings": ratings,
+        "director_ids": director_ids,
+        "title_offsets": title_offsets,
+        "title_data": title_data,
+        "dir_offsets": director_offsets,
+        "dir_data": director_data,
+        "year_index": year_index,
+        "key_offsets": key_offsets,
+        "key_data": key_data,
+        "key_ids": autocomplete._ids,
+        "by_rating": autocomplete._by_rating,
+    }
+
+    table_end = _HEADER.size + _SECTION.size * len(sections)
+    entries = []
+    offset = table_end
+    for name, data in sections.items():
+        offset += -offset % _ALIGN
+        length = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        typecode = data.typecode if isinstance(data, array) else "B"
+        entries.append((name, typecode, offset, length, data))
+        offset += length
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as output:
+        output.write(_HEADER.pack(MAGIC, VERSION, change_seq, len(ids), len(sections)))
+        for name, typecode, offset, length, _ in entries:
+            output.write(_SECTION.pack(name.encode(), typecode.encode(), offset, length))
+        for name, typecode, offset, length, data in entries:
+            output.write(b"\0" * (offset - output.tell()))
+            output.write(data.tobytes() if isinstance(data, array) else data)
+    os.replace(temporary, path)
+    return {"path": path, "rows": len(ids), "change_seq": change_seq, "bytes": offset}
+
+class Snapshot:
+    """A snapshot file mapped read-only into memory.
+
+    column() returns zero-copy views of the mapped pages, so workers that
+    open the same file share them through the page cache. array() and
+    strings() copy out of the mapping; the in-process structures are
+    mutable and need their own buffers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as source:
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mmap) < _HEADER.size:
+                raise SnapshotError("File is too short")
+            magic, version, self.change_seq, self.rows, count = _HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise SnapshotError("Not a movie snapshot")
+            if version != VERSION:
+                raise SnapshotError(f"Snapshot version {version} is not supported (expected {VERSION})")
+            self._sections: Dict[str, Tuple[str, int, int]] = {}
+            for index in range(count):
+                name, typecode, offset, length = _SECTION.unpack_from(
+                    self._mmap, _HEADER.size + index * _SECTION.size
+                )
+                if offset + length > len(self._mmap):
+                    raise SnapshotError("Snapshot is truncated")
+                self._sections[name.rstrip(b"\0").decode()] = (typecode.decode(), offset, length)
+            self.meta = json.loads(bytes(self.column("meta")))
+            if self.meta["byteorder"] != sys.byteorder:
+                raise SnapshotError("Snapshot was written on a machine with another byte order")
+        except SnapshotError:
+            self._mmap.close()
+            raise
+        except (KeyError, ValueError, struct.error) as e:
+            self._mmap.close()
+            raise SnapshotError(f"Corrupt snapshot: {e!r}") from e
+
+    def column(self, name: str) -> memoryview:
+        """A section as a typed, read-only view of the mapped file"""
+        typecode, offset, length = self._sections[name]
+        view = memoryview(self._mmap)[offset:offset + length]
+        return view if typecode == "B" else view.cast(typecode)
+
+    def array(self, name: str) -> array:
+        """A copy of a section as a mutable array"""
+        typecode = self._sections[name][0]
+        column = array(typecode)
+        column.frombytes(self.column(name).cast("B"))
+        return column
+
+    def strings(self, prefix: str) -> List[str]:
+        """Decode a string table written by _pack_strings"""
+        offsets = self.column(f"{prefix}_offsets")
+        text = str(self.column(f"{prefix}_data"), "utf-8")
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def byte_strings(self, prefix: str) -> List[bytes]:
+        offsets = self.column(f"{prefix}_offsets")
+        data = bytes(self.column(f"{prefix}_data"))
+        return [data[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def movies(self) -> Iterator[Tuple[int, str, str, int, float]]:
+        """(id, title, director, year, rating) rows in ID order"""
+        directors = self.strings("dir")
+        return zip(
+            self.column("ids"),
+            self.strings("title"),
+            (directors[index] for index in self.column("director_ids")),
+            self.column("years"),
+            self.column("ratings"),
+        )
+
+    def close(self) -> None:
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Views are still exported; the mapping goes away with the last of them
+            pass
+
+def open_snapshot(path: str) -> Optional[Snapshot]:
+    """Open a snapshot, or return None (logging why) if it is missing or unreadable"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return Snapshot(path)
+    except SnapshotError as e:
+        logger.warning("Ignoring snapshot %s: %s", path, e)
+        return None
+
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    if not path:
+        sys.exit("Pass a path or set SNAPSHOT_PATH")
+    create_tables()
+    db = SessionLocal()
+    try:
+        result = write_snapshot(db, path)
+    finally:
+        db.close()
+    print(f"Wrote {result['rows']} movies at change {result['change_seq']} "
+          f"to {result['path']} ({result['bytes'] / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and collapse punctuation to single spaces"""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
@@ -0,0 +1,327 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Fraction of new traces to record; requests with a traceparent follow its sampled flag
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0"))
+# "log" writes finished spans as JSON to the app.tracing logger
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "")
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_ID_LIMIT = 1 << 64
+
+class Span:
+    """One timed operation, shaped like an OpenTelemetry span.
+
+    IDs are lowercase hex (128-bit trace, 64-bit span) as in W3C Trace
+    Context, and times are nanoseconds since the epoch.
+    """
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id",
+                 "start_ns", "end_ns", "attributes", "status", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 kind: str = "internal", attributes: Optional[dict] = None):
+        self._tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64) or 1:016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.status = "unset"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, name: str, value) -> None:
+        self.attributes[name] = value
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.status = "error"
+        self.attributes["exception.type"] = type(exception).__name__
+        self.attributes["exception.message"] = str(exception)
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._tracer._export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list, for tests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+class LoggingSpanExporter:
+    """Logs each finished span as one JSON line"""
+
+    def export(self, span: Span) -> None:
+        logger.info(json.dumps(span.to_dict(), default=str))
+
+# The active span of the current request, or None when it is not being traced
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span_id, sampled) from a W3C traceparent header, or None if invalid"""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+class Tracer:
+    """Parent-based, trace-ID-ratio sampler and span factory.
+
+    Only the root span of a request makes a sampling decision. Everything
+    below it checks the current span first and does nothing when there is
+    none, so an unsampled request costs one ContextVar lookup per
+    instrumented call.
+    """
+
+    def __init__(self, sample_ratio: float = TRACE_SAMPLE_RATIO):
+        self.sample_ratio = sample_ratio
+        self.exporters: list = []
+
+    def should_sample(self, trace_id: str) -> bool:
+        # The low 64 bits of a random trace ID are uniform, as in OpenTelemetry's TraceIdRatioBased
+        return int(trace_id[16:], 16) < self.sample_ratio * _ID_LIMIT
+
+    def start_root(self, name: str, traceparent: Optional[str] = None,
+                   attributes: Optional[dict] = None) -> Optional[Span]:
+        """Start a server span for an incoming request, or None if it is not sampled"""
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128) or 1:032x}", None
+            sampled = self.should_sample(trace_id)
+        if not sampled or not self.exporters:
+            return None
+        return Span(self, name, trace_id, parent_id, "server", attributes)
+
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[dict] = None) -> Optional[Span]:
+        """Start a child of the current span without making it current, or None"""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.exception("Span exporter %r failed", exporter)
+
+tracer = Tracer()
+if TRACE_EXPORTER == "log":
+    tracer.exporters.append(LoggingSpanExporter())
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+@contextmanager
+def activate(span: Optional[Span]) -> Iterator[Optional[Span]]:
+    """Make span current for the block and end it afterwards"""
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+def span(name: str, **attributes):
+    """Context manager for a child span of the current one; a no-op when untraced"""
+    if _current_span.get() is None:
+        return nullcontext()
+    return activate(tracer.start_span(name, attributes=attributes))
+
+def traced(name: str) -> Callable:
+    """Decorator running each call of a function in a span called name"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return function(*args, **kwargs)
+            with activate(tracer.start_span(name)):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def trace_methods(cls):
+    """Class decorator tracing every public, synchronous static method as Class.method"""
+    for name, attribute in list(vars(cls).items()):
+        if (isinstance(attribute, staticmethod) and not name.startswith("_")
+                and not inspect.iscoroutinefunction(attribute.__func__)):
+            setattr(cls, name, staticmethod(traced(f"{cls.__name__}.{name}")(attribute.__func__)))
+    return cls
+
+# Statements that never claim the span of the ORM statement they run under
+_TRANSACTION_CONTROL = frozenset({"BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE"})
+
+def _returns_rows(orm_execute_state) -> bool:
+    if orm_execute_state.is_select:
+        return True
+    is_dml = orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    # The RETURNING columns of a DML statement
+    return is_dml and len(orm_execute_state.statement.exported_columns) > 0
+
+@event.listens_for(Session, "do_orm_execute")
+def _trace_orm_execute(orm_execute_state):
+    """Wrap ORM statements in a span that counts the rows they return or touch.
+    
+    SELECTs and DML with RETURNING are buffered to count their rows; other
+    DML gets the driver's row count below. Streamed (yield_per) results are
+    left alone and only get the cursor-level span.
+    """
+    if _current_span.get() is None or orm_execute_state.execution_options.get("yield_per"):
+        return None
+    with activate(tracer.start_span("SQL", kind="client")) as statement_span:
+        if not _returns_rows(orm_execute_state):
+            return orm_execute_state.invoke_statement()
+        frozen = orm_execute_state.invoke_statement().freeze()
+        statement_span.set_attribute("db.rowcount", len(frozen.data))
+    return frozen()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    current = _current_span.get()
+    if current is None:
+        return
+    words = statement.split(None, 1)
+    name = words[0].upper() if words else "SQL"
+    attributes = {"db.system": conn.dialect.name, "db.statement": statement}
+    if current.kind == "client" and "db.statement" not in current.attributes and name not in _TRANSACTION_CONTROL:
+        # The span opened by _trace_orm_execute for this statement
+        current.name = name
+        current.attributes.update(attributes)
+        conn.info.setdefault("trace_spans", []).append((current, False))
+    else:
+        statement_span = tracer.start_span(name, kind="client", attributes=attributes)
+        conn.info.setdefault("trace_spans", []).append((statement_span, True))
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    spans = conn.info.get("trace_spans")
+    if not spans:
+        return
+    statement_span, owned = spans.pop()
+    # Drivers only know the count up front for statements that return no rows
+    if cursor.description is None and cursor.rowcount is not None and cursor.rowcount >= 0:
+        statement_span.set_attribute("db.rowcount", cursor.rowcount)
+    if owned:
+        statement_span.end()
+
+@event.listens_for(Engine, "handle_error")
+def _fail_statement(exception_context) -> None:
+    connection = exception_context.connection
+    spans = connection.info.get("trace_spans") if connection is not None else None
+    if spans:
+        statement_span, owned = spans.pop()
+        statement_span.record_exception(exception_context.original_exception)
+        if owned:
+            statement_span.end()
+
+def _header(headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request.
+
+    The span continues the caller's trace when a traceparent header is
+    present, is named after the matched route template once routing has
+    run, and is current while the rest of the app handles the request.
+    """
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root = self.tracer.start_root(
+            f"{scope['method']} {scope['path']}",
+            _header(scope["headers"], b"traceparent"),
+            {"http.request.method": scope["method"], "url.path": scope["path"]},
+        )
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = "error"
+            await send(message)
+
+        with activate(root):
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"{scope['method']} {route.path}"
+                    root.set_attribute("http.route", route.path)
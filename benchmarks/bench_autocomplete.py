@@ -0,0 +1,71 @@
+"""
+Measure autocomplete index memory per title and query latency on a synthetic catalog.
+
+Usage: python -m benchmarks.bench_autocomplete [rows ...]   (default: 1000000 10000000)
+"""
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from app.autocomplete import AutocompleteIndex
+
+WORDS = [
+    "the", "dark", "night", "return", "of", "star", "war", "love", "last", "city",
+    "lost", "king", "blue", "red", "house", "dead", "man", "girl", "story", "river",
+    "shadow", "empire", "ghost", "summer", "winter", "secret", "edge", "fire", "moon", "road",
+]
+FIRST_NAMES = ["Ana", "Ben", "Chris", "Dana", "Eli", "Fatima", "Greta", "Hiro", "Ivan", "Jules"]
+
+def synthetic_rows(rows: int):
+    rng = random.Random(42)
+    for movie_id in range(1, rows + 1):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) + f" {movie_id}"
+        director = f"{rng.choice(FIRST_NAMES)} Director{movie_id % 50000}"
+        yield movie_id, title.title(), director, round(rng.uniform(0, 10), 1)
+
+def build(rows: int) -> AutocompleteIndex:
+    index = AutocompleteIndex()
+    index.load_rows(synthetic_rows(rows))
+    return index
+
+def traced_bytes(rows: int) -> int:
+    tracemalloc.start()
+    index = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del index
+    return current
+
+def main(sizes) -> None:
+    for rows in sizes:
+        start = time.perf_counter()
+        index = build(rows)
+        elapsed = time.perf_counter() - start
+        # Millions of fresh objects trigger a full GC pass; keep it out of query timings
+        gc.collect()
+        print(f"{rows:>10} titles: build {elapsed:6.1f} s, {len(index._keys)} keys")
+
+        for query in ["t", "the d", "shadow emp", "chris", "9999"]:
+            start = time.perf_counter()
+            index.search(query)
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(1000):
+                index.search(query)
+            repeat = (time.perf_counter() - start) / 1000
+            print(f"    q={query!r:<14} first {first * 1e6:10.1f} us   repeat {repeat * 1e6:8.2f} us")
+
+        start = time.perf_counter()
+        for movie_id in range(rows + 1, rows + 101):
+            index.apply("create", movie_id, {"title": f"The Dark {movie_id}", "director": "Chris New", "rating": 9.9})
+        print(f"    write (insert into index)      {(time.perf_counter() - start) / 100 * 1e6:10.1f} us")
+        del index
+
+        current = traced_bytes(rows)
+        print(f"    memory {current / 1e6:8.1f} MB traced, {current / rows:6.0f} bytes/title")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000000, 10000000])
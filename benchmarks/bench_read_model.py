@@ -0,0 +1,77 @@
+"""
+Compare year-range and stats queries on SQLite against the in-memory read model.
+
+Usage: python -m benchmarks.bench_read_model [rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, Movie
+from app.read_model import MovieReadModel
+from app.services import MovieService
+
+def populate(db, rows: int) -> None:
+    directors = [f"Director {i}" for i in range(max(rows // 20, 1))]
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "title": f"Movie {i}",
+            "director": random.choice(directors),
+            "year": random.randint(1900, 2025),
+            "rating": round(random.uniform(0, 10), 1),
+        })
+        if len(batch) == 50000:
+            db.execute(insert(Movie), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Movie), batch)
+    db.commit()
+
+def timed(label: str, fn, repeat: int = 20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1000:9.3f} ms")
+    return result
+
+def main(rows: int) -> None:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        populate(db, rows)
+        model = MovieReadModel()
+        timed("read model load (full scan)", lambda: model.load(db), repeat=1)
+
+        queries = [(1995, 1995, None), (1990, 2000, None), (1990, 2000, 8.0)]
+        for start_year, end_year, min_rating in queries:
+            label = f"{start_year}-{end_year} rating>={min_rating}"
+            sql = timed(f"sql    {label}", lambda: MovieService.get_movies_by_year_range(db, start_year, end_year, min_rating), repeat=5)
+            mem = timed(f"memory {label}", lambda: model.year_range(start_year, end_year, min_rating), repeat=5)
+            assert len(sql) == len(mem)
+        timed("sql    stats", lambda: MovieService.get_movie_stats(db))
+        timed("memory stats", model.stats)
+
+        usage = model.memory_usage()
+        total = sum(value for key, value in usage.items() if key != "rows")
+        print(f"\nread model footprint for {usage['rows']} rows: {total / 1e6:.1f} MB")
+        for key, value in usage.items():
+            if key != "rows":
+                print(f"  {key:<14} {value / 1e6:9.2f} MB")
+    finally:
+        db.close()
+        engine.dispose()
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
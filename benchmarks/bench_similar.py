@@ -0,0 +1,46 @@
+"""
+Measure similar-movies index build time and query latency on a synthetic catalog.
+
+Usage: python -m benchmarks.bench_similar [rows]
+"""
+
+import gc
+import random
+import sys
+import time
+
+from app.similar import SimilarityIndex, build_state
+
+from benchmarks.bench_autocomplete import synthetic_rows
+
+def main(rows: int) -> None:
+    rng = random.Random(7)
+    catalog = [
+        (movie_id, title, director, rng.randint(1920, 2025), rating)
+        for movie_id, title, director, rating in synthetic_rows(rows)
+    ]
+
+    start = time.perf_counter()
+    state = build_state(catalog)
+    print(f"{rows} movies: build {time.perf_counter() - start:.1f} s")
+
+    index = SimilarityIndex()
+    index._install(state)
+    gc.collect()
+
+    timings = []
+    for movie_id in rng.sample(range(1, rows + 1), 500):
+        start = time.perf_counter()
+        index.similar(movie_id, k=10)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"  uncached query: median {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms, max {timings[-1] * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.similar(movie_id, k=10)
+    print(f"  cached query:   {(time.perf_counter() - start) * 1000:.3f} us")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
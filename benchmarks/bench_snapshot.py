@@ -0,0 +1,84 @@
+"""
+Compare warming the read model and autocomplete index from a table scan
+against loading a snapshot and replaying the writes made since.
+
+Usage: python -m benchmarks.bench_snapshot [rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.autocomplete import AutocompleteIndex
+from app.database import Base, Movie
+from app.read_model import MovieReadModel
+from app.schemas import MovieUpdate
+from app.services import MovieService
+from app.snapshot import Snapshot, write_snapshot
+
+from benchmarks.bench_autocomplete import synthetic_rows
+
+def populate(db, rows: int) -> None:
+    rng = random.Random(7)
+    batch = []
+    for _, title, director, rating in synthetic_rows(rows):
+        batch.append({"title": title, "director": director, "year": rng.randint(1920, 2025), "rating": rating})
+        if len(batch) == 50000:
+            db.execute(insert(Movie), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Movie), batch)
+    db.commit()
+
+def main(rows: int) -> None:
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(db_fd)
+    snapshot_path = f"{db_path}.snapshot"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    try:
+        populate(db, rows)
+
+        start = time.perf_counter()
+        result = write_snapshot(db, snapshot_path)
+        print(f"{rows} movies: snapshot written in {time.perf_counter() - start:.1f} s, "
+              f"{result['bytes'] / 1e6:.1f} MB")
+        for movie_id in range(1, 1001):
+            MovieService.update_movie(db, movie_id, MovieUpdate(rating=5.0))
+
+        start = time.perf_counter()
+        read_model, autocomplete = MovieReadModel(), AutocompleteIndex()
+        read_model.load(db)
+        autocomplete.load(db)
+        print(f"  table scan:           {time.perf_counter() - start:6.2f} s")
+
+        start = time.perf_counter()
+        snapshot = Snapshot(snapshot_path)
+        opened = time.perf_counter() - start
+        read_model, autocomplete = MovieReadModel(), AutocompleteIndex()
+        read_model.load_snapshot(snapshot)
+        loaded_read_model = time.perf_counter() - start
+        autocomplete.load_snapshot(snapshot)
+        loaded = time.perf_counter() - start
+        MovieService.subscribe(read_model.apply)
+        MovieService.subscribe(autocomplete.apply)
+        MovieService.replay_changes(db, snapshot.change_seq)
+        replayed = time.perf_counter() - start
+        snapshot.close()
+        print(f"  snapshot: mmap {opened * 1000:.2f} ms, read model {loaded_read_model:.2f} s, "
+              f"+ autocomplete {loaded:.2f} s, + replay 1000 writes {replayed:.2f} s")
+    finally:
+        db.close()
+        engine.dispose()
+        os.unlink(db_path)
+        if os.path.exists(snapshot_path):
+            os.unlink(snapshot_path)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
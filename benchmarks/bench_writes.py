@@ -0,0 +1,88 @@
+"""
+Compare update/delete throughput of select-then-write against UPDATE/DELETE ... RETURNING.
+
+Usage: python -m benchmarks.bench_writes [operations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base, Movie
+from app.schemas import MovieUpdate
+from app.services import MovieService, _movie_values, _record_change
+
+def legacy_update_movie(db: Session, movie_id: int, movie_update: MovieUpdate):
+    """Previous implementation: SELECT, mutate, COMMIT, refresh SELECT"""
+    db_movie = db.query(Movie).filter(Movie.id == movie_id).first()
+    if not db_movie:
+        return None
+    for field, value in movie_update.model_dump(exclude_unset=True).items():
+        setattr(db_movie, field, value)
+    _record_change(db, "update", movie_id, _movie_values(db_movie))
+    db.commit()
+    db.refresh(db_movie)
+    return db_movie
+
+def legacy_delete_movie(db: Session, movie_id: int) -> bool:
+    """Previous implementation: SELECT, DELETE, COMMIT"""
+    db_movie = db.query(Movie).filter(Movie.id == movie_id).first()
+    if not db_movie:
+        return False
+    db.delete(db_movie)
+    _record_change(db, "delete", movie_id)
+    db.commit()
+    return True
+
+def run(label: str, session_factory, operations: int, update_fn, delete_fn) -> None:
+    db = session_factory()
+    db.execute(insert(Movie), [
+        {"title": f"Movie {i}", "director": "Director", "year": 2000, "rating": 5.0}
+        for i in range(operations)
+    ])
+    db.commit()
+    ids = [movie_id for (movie_id,) in db.query(Movie.id).order_by(Movie.id)]
+
+    start = time.perf_counter()
+    for i, movie_id in enumerate(ids):
+        update_fn(db, movie_id, MovieUpdate(rating=(i % 100) / 10))
+    update_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for movie_id in ids:
+        delete_fn(db, movie_id)
+    delete_elapsed = time.perf_counter() - start
+    db.close()
+
+    print(f"{label:<10} updates/sec {operations / update_elapsed:10.0f}   deletes/sec {operations / delete_elapsed:10.0f}")
+
+def main(operations: int) -> None:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def no_fsync(dbapi_connection, connection_record):
+        # Without this, fsync on every commit dominates and hides statement cost
+        dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+    Base.metadata.create_all(engine)
+    try:
+        run("before", sessionmaker(bind=engine), operations, legacy_update_movie, legacy_delete_movie)
+        run(
+            "after",
+            sessionmaker(bind=engine, expire_on_commit=False),
+            operations,
+            MovieService.update_movie,
+            MovieService.delete_movie,
+        )
+    finally:
+        engine.dispose()
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
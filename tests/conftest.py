@@ -1,12 +1,22 @@
 import pytest
 import os
 import tempfile
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 
+# Point the app's own engine at a throwaway file before it is imported, so
+# import-time table creation and the default job manager never touch ./movies.db
+_app_db_fd, _app_db_path = tempfile.mkstemp(suffix=".db")
+os.close(_app_db_fd)
+os.environ["DATABASE_URL"] = f"sqlite:///{_app_db_path}"
+
 from app.main import create_app
 from app.database import Base, get_db
+from app.jobs import JobManager, get_job_manager
+
+def pytest_sessionfinish(session, exitstatus):
+    os.unlink(_app_db_path)
 
 # Create a temporary database for testing
 @pytest.fixture(scope="session")
@@ -17,7 +27,17 @@ def temp_db():
     
     # Create engine and session
     engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    # pysqlite defers BEGIN and breaks SAVEPOINT; let SQLAlchemy emit BEGIN itself
+    # so service rollbacks can stay inside each test's outer transaction
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN")
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
     
     # Create tables
     Base.metadata.create_all(bind=engine)
@@ -32,7 +52,7 @@ def db_session(temp_db):
     TestingSessionLocal, engine = temp_db
     connection = engine.connect()
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
     
     yield session
     
@@ -41,15 +61,19 @@ def db_session(temp_db):
     connection.close()
 
 @pytest.fixture
-def client(db_session):
+def client(db_session, temp_db, tmp_path):
     def override_get_db():
         try:
             yield db_session
         finally:
             pass
     
+    _, engine = temp_db
+    manager = JobManager(str(engine.url), data_dir=str(tmp_path / "job_data"))
+    
     app = create_app()
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_job_manager] = lambda: manager
     
     with TestClient(app) as test_client:
         yield test_client
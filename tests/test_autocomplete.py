@@ -0,0 +1,106 @@
+import pytest
+from app.autocomplete import AutocompleteIndex, normalize
+from app.database import Movie
+from app.schemas import MovieCreate, MovieUpdate
+from app.services import MovieService
+
+@pytest.fixture
+def index(db_session, sample_movies):
+    for movie_data in sample_movies:
+        MovieService.create_movie(db_session, MovieCreate(**movie_data))
+    index = AutocompleteIndex()
+    index.load(db_session)
+    MovieService.subscribe(index.apply)
+    yield index
+    MovieService.unsubscribe(index.apply)
+
+class TestAutocomplete:
+    """Test cases for the prefix autocomplete index"""
+
+    def test_normalize(self):
+        """Test accents, case and punctuation are folded"""
+        assert normalize("  Amélie: Le Fabuleux-Destin ") == "amelie le fabuleux destin"
+
+    def test_prefix_of_any_word(self, index):
+        """Test prefixes match the start of any title or director word"""
+        assert [movie["title"] for movie in index.search("mat")] == ["The Matrix"]
+        assert [movie["title"] for movie in index.search("THE MA")] == ["The Matrix"]
+        assert {movie["title"] for movie in index.search("nolan")} == {"Inception", "Interstellar"}
+        assert index.search("atrix") == []
+        assert index.search("  ") == []
+
+    def test_ranked_by_rating(self, index):
+        """Test suggestions are ordered by rating and respect the limit"""
+        assert [movie["title"] for movie in index.search("in")] == ["Inception", "Interstellar"]
+        assert [movie["title"] for movie in index.search("in", limit=1)] == ["Inception"]
+
+    def test_incremental_updates(self, db_session, index):
+        """Test writes through MovieService update the index and its memo"""
+        assert index.search("dune") == []
+
+        movie = MovieService.create_movie(
+            db_session, MovieCreate(title="Dune", director="Denis Villeneuve", year=2021, rating=8.0)
+        )
+        assert [result["id"] for result in index.search("dune")] == [movie.id]
+
+        MovieService.update_movie(db_session, movie.id, MovieUpdate(title="Arrival"))
+        assert index.search("dune") == []
+        assert [result["id"] for result in index.search("arr")] == [movie.id]
+
+        MovieService.delete_movie(db_session, movie.id)
+        assert index.search("arr") == []
+        assert index.search("villeneuve") == []
+
+    def test_autocomplete_endpoint(self, client, sample_movies):
+        """Test the endpoint serves suggestions from the startup index"""
+        ids = [client.post("/movies/", json=movie).json()["id"] for movie in sample_movies]
+
+        response = client.get("/movies/autocomplete?q=inter")
+        assert response.status_code == 200
+        assert response.json()["suggestions"] == [
+            {"id": ids[2], "title": "Interstellar", "director": "Christopher Nolan", "rating": 8.6}
+        ]
+
+    def test_autocomplete_sql_fallback(self, db_session, sample_movies):
+        """Test the SQL fallback ranks title and director prefixes by rating"""
+        for movie_data in sample_movies:
+            MovieService.create_movie(db_session, MovieCreate(**movie_data))
+
+        movies = MovieService.autocomplete_movies(db_session, "chris")
+        assert [movie.title for movie in movies] == ["Inception", "Interstellar"]
+
+        # Rows from before dedup keys are matched on their raw columns
+        db_session.add(Movie(title="The Third Man", director="Carol Reed", year=1949, rating=8.1))
+        db_session.commit()
+        assert [movie.title for movie in MovieService.autocomplete_movies(db_session, "third")] == ["The Third Man"]
+        assert MovieService.autocomplete_movies(db_session, "%") == []
+
+    def test_sql_fallback_matches_index(self, db_session, index):
+        """Test the same queries give the same suggestions with the index on and off"""
+        MovieService.create_movie(
+            db_session, MovieCreate(title="Amélie", director="Jean-Pierre Jeunet", year=2001, rating=8.3)
+        )
+        MovieService.create_movie(
+            db_session, MovieCreate(title="100% Wolf_Pack", director="Alexs Stadermann", year=2020, rating=5.6)
+        )
+        queries = ["mat", "THE MA", "nolan", "atrix", "in", "amel", "pierre", "jeunet", "wolf",
+                   "1999", "matrix the", "%", "_", "w_lf", "100", "  "]
+        for query in queries:
+            fallback = [
+                {"id": movie.id, "title": movie.title, "director": movie.director, "rating": movie.rating}
+                for movie in MovieService.autocomplete_movies(db_session, query)
+            ]
+            assert fallback == index.search(query), query
+
+    def test_heavy_prefix_top_list(self, db_session, index, monkeypatch):
+        """Test ranked top lists for popular prefixes follow writes"""
+        monkeypatch.setattr("app.autocomplete.HEAVY_PREFIX_KEYS", 1)
+        assert [movie["title"] for movie in index.search("i")] == ["Inception", "Interstellar"]
+
+        movie = MovieService.create_movie(
+            db_session, MovieCreate(title="Ikiru", director="Akira Kurosawa", year=1952, rating=9.5)
+        )
+        assert [result["title"] for result in index.search("i")] == ["Ikiru", "Inception", "Interstellar"]
+
+        MovieService.delete_movie(db_session, movie.id)
+        assert [result["title"] for result in index.search("i")] == ["Inception", "Interstellar"]
@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+from sqlalchemy import create_engine, inspect, text
+
+from app.database import Movie, migrate
+from app.dedup import merge_duplicates
+from app.schemas import MovieCreate
+from app.services import MovieService, dedup_key
+
+class TestDedup:
+    """Test cases for dedup key migration and duplicate merging"""
+
+    def test_migrate_adds_dedup_key(self):
+        """Test a database created before dedup keys gains the column and unique index"""
+        db_fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(db_fd)
+        engine = create_engine(f"sqlite:///{db_path}")
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(
+                    "CREATE TABLE movies (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, "
+                    "director VARCHAR NOT NULL, year INTEGER NOT NULL, rating FLOAT NOT NULL)"
+                ))
+            migrate(engine)
+            migrate(engine)
+
+            assert "dedup_key" in {column["name"] for column in inspect(engine).get_columns("movies")}
+            assert any(index["unique"] for index in inspect(engine).get_indexes("movies"))
+        finally:
+            engine.dispose()
+            os.unlink(db_path)
+
+    def test_merge_duplicates(self, db_session):
+        """Test legacy rows are keyed and their duplicates removed, keeping the lowest ID"""
+        legacy = [
+            Movie(title="The Matrix", director="The Wachowskis", year=1999, rating=8.7),
+            Movie(title="Inception", director="Christopher Nolan", year=2010, rating=8.8),
+            Movie(title="the matrix.", director="the wachowskis", year=1999, rating=8.0),
+            Movie(title="INCEPTION", director="Christopher Nolan", year=2010, rating=7.0),
+            Movie(title="The Matrix", director="The Wachowskis", year=2003, rating=7.2),
+        ]
+        db_session.add_all(legacy)
+        db_session.commit()
+
+        assert merge_duplicates(db_session, batch_size=2, dry_run=True)["merged"] == 2
+        assert MovieService.get_movies_count(db_session) == 5
+
+        stats = merge_duplicates(db_session, batch_size=2)
+        assert stats == {"scanned": 5, "backfilled": 3, "merged": 2}
+
+        remaining = db_session.query(Movie).order_by(Movie.id).all()
+        assert [movie.id for movie in remaining] == [legacy[0].id, legacy[1].id, legacy[4].id]
+        assert remaining[0].dedup_key == dedup_key("The Matrix", "The Wachowskis", 1999)
+        assert [change.op for change in MovieService.get_changes(db_session)] == ["delete", "delete"]
+
+        assert merge_duplicates(db_session) == {"scanned": 3, "backfilled": 0, "merged": 0}
+
+    def test_merge_keeps_legacy_row_over_newer_keyed_duplicate(self, db_session):
+        """Test a legacy row keeps its ID when a newer duplicate was keyed through the API"""
+        legacy = Movie(title="Heat", director="Michael Mann", year=1995, rating=8.3)
+        other = Movie(title="Alien", director="Ridley Scott", year=1979, rating=8.5)
+        db_session.add_all([legacy, other])
+        db_session.commit()
+        newer = MovieService.create_movie(db_session, MovieCreate(
+            title="HEAT", director="Michael Mann", year=1995, rating=8.0
+        ))
+
+        assert merge_duplicates(db_session, batch_size=1, dry_run=True) == {"scanned": 3, "backfilled": 2, "merged": 1}
+        assert MovieService.get_movies_count(db_session) == 3
+
+        stats = merge_duplicates(db_session, batch_size=1)
+        assert stats == {"scanned": 2, "backfilled": 2, "merged": 1}
+
+        remaining = db_session.query(Movie).order_by(Movie.id).all()
+        assert [movie.id for movie in remaining] == [legacy.id, other.id]
+        assert remaining[0].dedup_key == dedup_key("Heat", "Michael Mann", 1995)
+        assert MovieService.get_movie(db_session, newer.id) is None
+        assert [change.op for change in MovieService.get_changes(db_session)][-1] == "delete"
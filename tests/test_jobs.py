@@ -0,0 +1,189 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, Job, Movie
+from app.jobs import JobManager, JobQueueFull, get_job_manager, process_owner
+from app.main import create_app
+from app.schemas import MovieCreate
+from app.services import MovieService
+
+# Jobs run in other processes, so they need a real database file rather than
+# the rolled-back transaction the other tests share
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return url
+
+@pytest.fixture
+def file_session(database_url):
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def manager(database_url, tmp_path):
+    manager = JobManager(database_url, max_workers=1, data_dir=str(tmp_path / "data"))
+    yield manager
+    manager.shutdown(wait=True)
+
+class TestJobs:
+    """Test cases for background jobs"""
+
+    def test_export_and_import(self, manager, file_session, sample_movies, tmp_path):
+        """Test an export file can be imported back with conflict handling"""
+        for movie_data in sample_movies:
+            MovieService.create_movie(file_session, MovieCreate(**movie_data))
+
+        export = manager.wait(manager.submit("export").id, timeout=60)
+        assert export.status == "succeeded"
+        assert export.progress == 1.0
+        assert export.result["rows"] == 3
+        lines = (tmp_path / "data" / export.result["file"]).read_text().splitlines()
+        assert [json.loads(line)["title"] for line in lines] == [movie["title"] for movie in sample_movies]
+
+        imported = manager.wait(manager.submit("import", {"file": export.result["file"]}).id, timeout=60)
+        assert imported.result == {"created": 0, "skipped": 3, "updated": 0}
+
+        failed = manager.wait(manager.submit("import", {"file": export.result["file"], "on_conflict": "error"}).id, timeout=60)
+        assert failed.status == "failed"
+        assert "DuplicateMovieError" in failed.error
+
+    def test_import_replays_changes_to_listeners(self, manager):
+        """Test movies written by a worker reach this process's listeners"""
+        seen = []
+
+        def listener(op, movie_id, values):
+            seen.append((op, values["title"]))
+
+        MovieService.subscribe(listener)
+        try:
+            movies = [{"title": "Tenet", "director": "Christopher Nolan", "year": 2020, "rating": 7.3}]
+            job = manager.wait(manager.submit("import", {"movies": movies}).id, timeout=60)
+        finally:
+            MovieService.unsubscribe(listener)
+
+        assert job.result == {"created": 1, "skipped": 0, "updated": 0}
+        assert seen == [("create", "Tenet")]
+
+    def test_dedup_job(self, manager, file_session):
+        """Test the dedup job merges legacy duplicates"""
+        file_session.add_all([
+            Movie(title="Heat", director="Michael Mann", year=1995, rating=8.3),
+            Movie(title="HEAT", director="Michael Mann", year=1995, rating=8.0),
+        ])
+        file_session.commit()
+
+        job = manager.wait(manager.submit("dedup").id, timeout=60)
+        assert job.result == {"scanned": 2, "backfilled": 1, "merged": 1}
+        assert MovieService.get_movies_count(file_session) == 1
+
+    def test_cancel(self, manager):
+        """Test a job cancelled before it starts never runs"""
+        job = manager.submit("stats")
+        assert manager.cancel(job.id).cancel_requested is True
+
+        job = manager.wait(job.id, timeout=60)
+        assert job.status == "cancelled"
+        assert job.result is None
+        assert manager.cancel(job.id).status == "cancelled"
+
+    def test_queue_limit(self, manager):
+        """Test submissions beyond the pending limit are refused"""
+        manager.max_pending = 1
+        manager.submit("stats")
+        with pytest.raises(JobQueueFull):
+            manager.submit("stats")
+
+    def test_queue_limit_counts_other_processes(self, manager, file_session):
+        """Test unfinished jobs owned by another app process count against the limit"""
+        file_session.add(Job(kind="stats", status="running", owner="elsewhere:1:1"))
+        file_session.commit()
+        manager.max_pending = 1
+        with pytest.raises(JobQueueFull):
+            manager.submit("stats")
+
+    def test_recover_fails_orphaned_jobs(self, manager, file_session):
+        """Test startup fails jobs whose app process exited and leaves live owners alone"""
+        exited = subprocess.Popen([sys.executable, "-c", ""])
+        exited.wait()
+        host = socket.gethostname()
+        jobs = [
+            Job(kind="stats", status="running", owner=f"{host}:{exited.pid}:1"),
+            # Same PID as a live process, but a later one: the PID was reused
+            Job(kind="stats", status="queued", owner=f"{host}:{os.getpid()}:0"),
+            Job(kind="stats", status="queued", owner=None),
+            Job(kind="stats", status="running", owner=process_owner()),
+            Job(kind="stats", status="running", owner="elsewhere:1:1"),
+            Job(kind="stats", status="succeeded", owner=None),
+        ]
+        file_session.add_all(jobs)
+        file_session.commit()
+
+        assert manager.recover() == 3
+        assert [manager.get(job.id).status for job in jobs] == [
+            "failed", "failed", "failed", "running", "running", "succeeded"
+        ]
+        assert "Interrupted" in manager.get(jobs[0].id).error
+
+    def test_cancel_orphaned_job(self, manager, file_session):
+        """Test a job whose app process exited can still be cancelled"""
+        job = Job(kind="stats", status="queued", owner=None)
+        file_session.add(job)
+        file_session.commit()
+        assert manager.cancel(job.id).status == "cancelled"
+
+    def test_job_endpoints(self, manager):
+        """Test submitting, polling and cancelling jobs over HTTP"""
+        app = create_app()
+        app.dependency_overrides[get_job_manager] = lambda: manager
+        with TestClient(app) as client:
+            response = client.post("/jobs", json={"kind": "stats"})
+            assert response.status_code == 202
+            job_id = response.json()["id"]
+            assert response.json()["status"] == "queued"
+
+            manager.wait(job_id, timeout=60)
+            response = client.get(f"/jobs/{job_id}")
+            assert response.json()["status"] == "succeeded"
+            assert response.json()["result"]["count"] == 0
+
+            assert client.post(f"/jobs/{job_id}/cancel").status_code == 409
+            assert client.get("/jobs/999").status_code == 404
+            assert client.post("/jobs/999/cancel").status_code == 404
+            assert client.post("/jobs", json={"kind": "reindex"}).status_code == 422
+
+    def test_job_params_validated(self, manager, file_session):
+        """Test each job kind's params are checked before the job is queued"""
+        app = create_app()
+        app.dependency_overrides[get_job_manager] = lambda: manager
+        invalid = [
+            {"kind": "import", "params": {"movies": [], "on_conflict": "bogus"}},
+            {"kind": "import", "params": {}},
+            {"kind": "dedup", "params": {"batch_size": "abc"}},
+            {"kind": "dedup", "params": {"batch_size": 0}},
+            {"kind": "export", "params": {"fiel": "movies.ndjson"}},
+            {"kind": "stats", "params": {"verbose": True}},
+        ]
+        with TestClient(app) as client:
+            for body in invalid:
+                assert client.post("/jobs", json=body).status_code == 422, body
+            assert file_session.query(Job).count() == 0
+
+            response = client.post("/jobs", json={"kind": "dedup", "params": {"batch_size": "50"}})
+            assert response.status_code == 202
+            assert response.json()["params"] == {"batch_size": 50}
+            manager.wait(response.json()["id"], timeout=60)
@@ -0,0 +1,75 @@
+import pytest
+from app.read_model import MovieReadModel, read_model
+from app.schemas import MovieCreate, MovieUpdate
+from app.services import MovieService
+
+@pytest.fixture
+def loaded_read_model(db_session, sample_movies):
+    for movie_data in sample_movies:
+        MovieService.create_movie(db_session, MovieCreate(**movie_data))
+    read_model.load(db_session)
+    yield read_model
+    read_model.clear()
+
+class TestMovieReadModel:
+    """Test cases for the in-memory columnar read model"""
+
+    def test_year_range_matches_sql(self, db_session, sample_movies):
+        """Test range and rating filters agree with the SQL path"""
+        for movie_data in sample_movies:
+            MovieService.create_movie(db_session, MovieCreate(**movie_data))
+        model = MovieReadModel()
+        model.load(db_session)
+
+        for args in [(2000, 2015), (1990, 2000), (2025, 2030), (1990, 2020, 8.7), (1990, 2020, None, 8.7)]:
+            expected = MovieService.get_movies_by_year_range(db_session, *args)
+            rows = model.year_range(*args)
+            assert sorted(row["id"] for row in rows) == sorted(movie.id for movie in expected)
+
+    def test_rows_round_trip_exactly(self, loaded_read_model, sample_movies):
+        """Test float32 ratings are returned as the original values"""
+        rows = loaded_read_model.year_range(1900, 2030)
+        assert [row["year"] for row in rows] == sorted(movie["year"] for movie in sample_movies)
+        assert {row["rating"] for row in rows} == {movie["rating"] for movie in sample_movies}
+
+    def test_writes_keep_model_in_sync(self, db_session, loaded_read_model):
+        """Test create, update and delete are applied from MovieService"""
+        movie = MovieService.create_movie(
+            db_session, MovieCreate(title="Dune", director="Denis Villeneuve", year=2021, rating=8.0)
+        )
+        assert loaded_read_model.get(movie.id)["title"] == "Dune"
+
+        MovieService.update_movie(db_session, movie.id, MovieUpdate(year=1984))
+        assert [row["id"] for row in loaded_read_model.year_range(1984, 1984)] == [movie.id]
+        assert loaded_read_model.year_range(2021, 2021) == []
+
+        MovieService.delete_movie(db_session, movie.id)
+        assert loaded_read_model.get(movie.id) is None
+        assert len(loaded_read_model) == 3
+
+    def test_stats_and_memory_usage(self, db_session, loaded_read_model):
+        """Test aggregates match SQL and the footprint report covers each column"""
+        assert loaded_read_model.stats() == MovieService.get_movie_stats(db_session)
+
+        usage = loaded_read_model.memory_usage()
+        assert usage["rows"] == 3
+        assert usage["years"] >= 3 * 2
+        assert usage["ratings"] >= 3 * 4
+
+    def test_routes_use_read_model(self, client, loaded_read_model):
+        """Test year-range and stats endpoints are answered from the model"""
+        response = client.get("/movies/search/year-range/?start_year=2000&end_year=2015&min_rating=8.7")
+        assert response.status_code == 200
+        assert [movie["title"] for movie in response.json()["movies"]] == ["Inception"]
+
+        response = client.get("/movies/stats")
+        assert response.status_code == 200
+        assert response.json()["count"] == 3
+
+    def test_batch_served_from_read_model(self, client, loaded_read_model):
+        """Test batch lookups resolve IDs held by the read model"""
+        ids = [row["id"] for row in loaded_read_model.year_range(1900, 2030)]
+
+        response = client.get(f"/movies/batch?ids={ids[1]},{ids[0]},999")
+        assert [movie["id"] for movie in response.json()["movies"]] == [ids[1], ids[0]]
+        assert response.json()["missing"] == [999]
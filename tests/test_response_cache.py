@@ -0,0 +1,101 @@
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.database import Movie, get_db
+from app.main import create_app
+from app.response_cache import CachedResponse, ResponseCache, normalize_key
+from app.services import MovieService
+
+class TestResponseCache:
+    """Test cases for the pre-rendered response cache"""
+
+    def test_normalize_key(self):
+        """Test equivalent query strings map to the same key"""
+        assert normalize_key("/movies/", b"") == "/movies/"
+        assert normalize_key("/movies/", b"skip=0&limit=100") == "/movies/"
+        assert normalize_key("/movies/", b"title=Matrix&skip=0") == "/movies/?title=Matrix"
+        assert (
+            normalize_key("/movies/", b"limit=5&title=a")
+            == normalize_key("/movies/", b"title=a&limit=5")
+        )
+        assert normalize_key("/movies/1", b"") is None
+
+    def test_eviction_bounds(self):
+        """Test the cache stays within its entry and byte limits"""
+        cache = ResponseCache(max_entries=2, max_bytes=10)
+        generation = MovieService.generation
+
+        cache.put("a", CachedResponse(generation, b"1234", b'"a"', b"application/json"))
+        cache.put("b", CachedResponse(generation, b"1234", b'"b"', b"application/json"))
+        cache.get("a")
+        cache.put("c", CachedResponse(generation, b"1234", b'"c"', b"application/json"))
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+        cache.put("d", CachedResponse(generation, b"12345678", b'"d"', b"application/json"))
+        assert len(cache) == 1
+        assert cache.size == 8
+
+    def test_list_served_from_cache(self, client, sample_movies):
+        """Test a repeated list request is a cache hit with the same bytes"""
+        for movie in sample_movies:
+            client.post("/movies/", json=movie)
+
+        first = client.get("/movies/")
+        second = client.get("/movies/?limit=100&skip=0")
+
+        assert first.headers["x-cache"] == "MISS"
+        assert second.headers["x-cache"] == "HIT"
+        assert first.content == second.content
+        assert first.headers["etag"] == second.headers["etag"]
+
+    def test_write_invalidates_cache(self, client, sample_movie):
+        """Test any write makes cached responses stale"""
+        client.get("/movies/")
+        client.post("/movies/", json=sample_movie)
+
+        response = client.get("/movies/")
+        assert response.headers["x-cache"] == "MISS"
+        assert response.json()["total"] == 1
+
+    def test_if_none_match_returns_not_modified(self, client):
+        """Test a matching ETag gets a 304 response"""
+        etag = client.get("/movies/?title=Matrix").headers["etag"]
+
+        response = client.get("/movies/?title=Matrix", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_entries_expire(self):
+        """Test an entry is a miss once its TTL has passed, with no write in this process"""
+        cache = ResponseCache(ttl=0.05)
+        expires = time.monotonic() + cache.ttl
+        cache.put("a", CachedResponse(MovieService.generation, b"1", b'"a"', b"application/json", expires))
+        assert cache.get("a") is not None
+        time.sleep(0.06)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_write_from_another_process_shows_after_ttl(self, db_session, sample_movie, monkeypatch):
+        """Test a write that never reaches this process's listeners is served once entries expire"""
+        monkeypatch.setattr("app.response_cache.RESPONSE_CACHE_TTL", 0.05)
+
+        def override_get_db():
+            yield db_session
+
+        app = create_app()
+        app.dependency_overrides[get_db] = override_get_db
+        with TestClient(app) as client:
+            assert client.get("/movies/").json()["total"] == 0
+
+            # As app.dedup or another worker would: no listeners, no generation bump
+            db_session.execute(insert(Movie).values(**sample_movie))
+            db_session.commit()
+            time.sleep(0.06)
+
+            response = client.get("/movies/")
+            assert response.headers["x-cache"] == "MISS"
+            assert response.json()["total"] == 1
@@ -1,5 +1,15 @@
 import pytest
+import threading
 from fastapi.testclient import TestClient
+from app import routers
+from app.read_model import read_model
+from app.services import MovieService
+
+@pytest.fixture
+def read_model_enabled(monkeypatch):
+    monkeypatch.setattr("app.main.READ_MODEL_ENABLED", True)
+    yield
+    read_model.clear()
 
 class TestMovieRouters:
     """Test cases for Movie API endpoints"""
@@ -173,7 +183,33 @@ class TestMovieRouters:
         assert data["title"] == "The Matrix Reloaded"
         assert data["rating"] == 7.2
         assert data["director"] == sample_movie["director"]  # Should remain unchanged
-    
+
+    def test_read_after_write_skips_older_flight(self, client, sample_movie, monkeypatch):
+        """Test a read after a write does not join a flight that started before it"""
+        movie_id = client.post("/movies/", json=sample_movie).json()["id"]
+        rendered, release = threading.Event(), threading.Event()
+        render = routers._render_movie
+
+        def slow_first_render(db, movie_id):
+            body = render(db, movie_id)
+            if not rendered.is_set():
+                rendered.set()
+                release.wait(5)
+            return body
+
+        monkeypatch.setattr(routers, "_render_movie", slow_first_render)
+        before = []
+        reader = threading.Thread(target=lambda: before.append(client.get(f"/movies/{movie_id}").json()))
+        reader.start()
+        rendered.wait(5)
+        try:
+            client.put(f"/movies/{movie_id}", json={"rating": 7.2})
+            assert client.get(f"/movies/{movie_id}").json()["rating"] == 7.2
+        finally:
+            release.set()
+            reader.join()
+        assert before[0]["rating"] == sample_movie["rating"]
+
     def test_update_movie_not_found(self, client):
         """Test updating a non-existent movie"""
         update_data = {"title": "Non-existent Movie"}
@@ -261,4 +297,232 @@ class TestMovieRouters:
         
         # Test zero limit
         response = client.get("/movies/?limit=0")
-        assert response.status_code == 422
\ No newline at end of file
+        assert response.status_code == 422
+
+    def test_get_movie_stats(self, client, sample_movies):
+        """Test catalog aggregates endpoint"""
+        for movie in sample_movies:
+            client.post("/movies/", json=movie)
+        
+        response = client.get("/movies/stats")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["count"] == 3
+        assert data["min_year"] == 1999
+        assert data["max_year"] == 2014
+    
+    def test_get_movies_by_year_range_with_rating(self, client, sample_movies):
+        """Test year range filtered by minimum rating"""
+        for movie in sample_movies:
+            client.post("/movies/", json=movie)
+        
+        response = client.get("/movies/search/year-range/?start_year=2000&end_year=2015&min_rating=8.7")
+        assert response.status_code == 200
+        assert response.json()["count"] == 1
+    
+    def test_get_changes_since(self, client, sample_movie):
+        """Test the change feed returns writes in sequence order"""
+        created = client.post("/movies/", json=sample_movie).json()
+        client.put(f"/movies/{created['id']}", json={"rating": 9.0})
+        client.delete(f"/movies/{created['id']}")
+        
+        response = client.get("/movies/changes?since=0")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert [change["op"] for change in data["changes"]] == ["create", "update", "delete"]
+        assert data["changes"][1]["data"]["rating"] == 9.0
+        assert data["changes"][2]["data"] is None
+        assert data["next_since"] == data["changes"][-1]["seq"]
+        assert data["has_more"] is False
+        
+        response = client.get(f"/movies/changes?since={data['next_since']}")
+        assert response.json()["changes"] == []
+    
+    def test_get_changes_batched(self, client, sample_movies):
+        """Test the change feed pages through batches"""
+        for movie in sample_movies:
+            client.post("/movies/", json=movie)
+        
+        first = client.get("/movies/changes?since=0&limit=2").json()
+        assert len(first["changes"]) == 2
+        assert first["has_more"] is True
+        
+        second = client.get(f"/movies/changes?since={first['next_since']}&limit=2").json()
+        assert len(second["changes"]) == 1
+        assert second["has_more"] is False
+    
+    def test_get_changes_stream(self, client, sample_movies):
+        """Test streaming the change feed as NDJSON"""
+        for movie in sample_movies:
+            client.post("/movies/", json=movie)
+        
+        response = client.get("/movies/changes?since=0&limit=2&stream=true")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert len(response.text.splitlines()) == len(sample_movies)
+    
+    def test_get_changes_long_poll_timeout(self, client):
+        """Test long-polling returns an empty batch once the wait expires"""
+        response = client.get("/movies/changes?since=0&wait=0.2")
+        assert response.status_code == 200
+        assert response.json() == {"changes": [], "next_since": 0, "has_more": False}
+    
+    def test_get_changes_long_poll_wakes_on_write(self, client, sample_movie):
+        """Test a long-poll returns as soon as a write commits"""
+        writer = threading.Timer(0.1, client.post, args=("/movies/",), kwargs={"json": sample_movie})
+        writer.start()
+        response = client.get("/movies/changes?since=0&wait=10")
+        writer.join()
+        assert response.elapsed.total_seconds() < 5
+        assert [change["op"] for change in response.json()["changes"]] == ["create"]
+    
+    def test_get_movies_sparse_fields(self, client, sample_movies):
+        """Test fields= limits the attributes returned by list and search"""
+        for movie in sample_movies:
+            client.post("/movies/", json=movie)
+        
+        response = client.get("/movies/?fields=id,title")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert all(set(movie) == {"id", "title"} for movie in data["movies"])
+        
+        response = client.get("/movies/?title=Matrix&fields=title")
+        assert response.json()["movies"] == [{"title": "The Matrix"}]
+        
+        response = client.get("/movies/search/year-range/?start_year=2000&end_year=2015&fields=title,year")
+        assert sorted(movie["year"] for movie in response.json()["movies"]) == [2010, 2014]
+        assert all(set(movie) == {"title", "year"} for movie in response.json()["movies"])
+    
+    def test_get_movies_unknown_field(self, client):
+        """Test requesting an unknown field is rejected"""
+        response = client.get("/movies/?fields=id,budget")
+        assert response.status_code == 400
+        assert "budget" in response.json()["detail"]
+    
+    def test_get_movies_batch(self, client, sample_movies):
+        """Test resolving several IDs preserves order and reports missing ones"""
+        ids = [client.post("/movies/", json=movie).json()["id"] for movie in sample_movies]
+        
+        response = client.get(f"/movies/batch?ids={ids[2]},999,{ids[0]}")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert [movie["id"] for movie in data["movies"]] == [ids[2], ids[0]]
+        assert data["missing"] == [999]
+    
+    def test_batch_matches_single_get(self, read_model_enabled, client, sample_movie):
+        """Test batch lookups return the exact stored rating, even with the float32 read model loaded"""
+        movie_id = client.post("/movies/", json={**sample_movie, "rating": 7.123456789}).json()["id"]
+        single = client.get(f"/movies/{movie_id}").json()
+        assert single["rating"] == 7.123456789
+        
+        assert client.get(f"/movies/batch?ids={movie_id}").json()["movies"] == [single]
+        assert client.post("/movies/batch", json={"ids": [movie_id]}).json()["movies"] == [single]
+    
+    def test_post_movies_batch(self, client, sample_movies):
+        """Test the POST variant of batch lookup"""
+        ids = [client.post("/movies/", json=movie).json()["id"] for movie in sample_movies]
+        
+        response = client.post("/movies/batch", json={"ids": list(reversed(ids))})
+        assert response.status_code == 200
+        assert [movie["id"] for movie in response.json()["movies"]] == list(reversed(ids))
+        
+        response = client.post("/movies/batch", json={"ids": []})
+        assert response.status_code == 422
+    
+    def test_get_movies_batch_invalid_ids(self, client):
+        """Test non-numeric IDs are rejected"""
+        response = client.get("/movies/batch?ids=1,abc")
+        assert response.status_code == 400
+    
+    def test_create_duplicate_movie(self, client, sample_movie):
+        """Test duplicates conflict by default and can be skipped or updated"""
+        movie_id = client.post("/movies/", json=sample_movie).json()["id"]
+        duplicate = {**sample_movie, "title": "THE MATRIX", "rating": 9.5}
+        
+        response = client.post("/movies/", json=duplicate)
+        assert response.status_code == 409
+        
+        response = client.post("/movies/?on_conflict=skip", json=duplicate)
+        assert response.status_code == 200
+        assert response.json()["id"] == movie_id
+        assert response.json()["rating"] == 8.7
+        
+        response = client.post("/movies/?on_conflict=update", json=duplicate)
+        assert response.status_code == 200
+        assert response.json()["rating"] == 9.5
+        
+        assert client.post("/movies/?on_conflict=merge", json=duplicate).status_code == 422
+    
+    def test_create_movies_bulk(self, client, sample_movies):
+        """Test bulk create reports per-movie status and 409s on a duplicate"""
+        client.post("/movies/", json=sample_movies[0])
+        
+        response = client.post("/movies/bulk?on_conflict=skip", json={"movies": sample_movies})
+        assert response.status_code == 200
+        assert [result["status"] for result in response.json()["results"]] == ["skipped", "created", "created"]
+        
+        response = client.post("/movies/bulk", json={"movies": sample_movies})
+        assert response.status_code == 409
+        assert response.json()["detail"]["index"] == 0
+    
+    def test_update_movie_to_duplicate(self, client, sample_movies):
+        """Test an update colliding with another movie returns 409"""
+        ids = [client.post("/movies/", json=movie).json()["id"] for movie in sample_movies]
+        
+        response = client.put(f"/movies/{ids[2]}", json={"title": "Inception", "year": 2010})
+        assert response.status_code == 409
+    
+    def test_batch_operations(self, client, sample_movies):
+        """Test a batch runs operations in order and commits them together"""
+        ids = [client.post("/movies/", json=movie).json()["id"] for movie in sample_movies[:2]]
+        generation = MovieService.generation
+        
+        response = client.post("/batch", json={"operations": [
+            {"method": "POST", "path": "/movies/", "body": sample_movies[2]},
+            {"method": "PUT", "path": f"/movies/{ids[0]}", "body": {"rating": 9.0}},
+            {"method": "DELETE", "path": f"/movies/{ids[1]}"},
+            {"method": "POST", "path": "/movies/?on_conflict=skip", "body": sample_movies[2]},
+            {"method": "GET", "path": f"/movies/{ids[0]}"},
+        ]})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["status"] for result in results] == [201, 200, 200, 200, 200]
+        assert results[3]["body"]["id"] == results[0]["body"]["id"]
+        assert results[4]["body"]["rating"] == 9.0
+        assert MovieService.generation == generation + 1
+        assert client.get(f"/movies/{ids[0]}").json()["rating"] == 9.0
+        assert client.get(f"/movies/{ids[1]}").status_code == 404
+    
+    def test_batch_rolls_back_on_failure(self, client, sample_movie):
+        """Test a failing operation discards the whole batch and reports its index"""
+        generation = MovieService.generation
+        
+        response = client.post("/batch", json={"operations": [
+            {"method": "POST", "path": "/movies/", "body": sample_movie},
+            {"method": "PUT", "path": "/movies/999", "body": {"rating": 9.0}},
+        ]})
+        assert response.status_code == 404
+        detail = response.json()["detail"]
+        assert detail["index"] == 1
+        assert detail["error"] == "Movie not found"
+        assert [result["status"] for result in detail["results"]] == [201]
+        
+        assert MovieService.generation == generation
+        assert client.get("/movies/").json()["total"] == 0
+    
+    def test_batch_invalid_operations(self, client):
+        """Test invalid bodies and unsupported routes fail the batch"""
+        response = client.post("/batch", json={"operations": [
+            {"method": "POST", "path": "/movies/", "body": {"title": "Untitled"}}
+        ]})
+        assert response.status_code == 422
+        assert response.json()["detail"]["index"] == 0
+        
+        response = client.post("/batch", json={"operations": [{"method": "GET", "path": "/movies/stats"}]})
+        assert response.status_code == 404
+        
+        assert client.post("/batch", json={"operations": []}).status_code == 422
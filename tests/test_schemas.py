@@ -1,6 +1,6 @@
 import pytest
 from pydantic import ValidationError
-from app.schemas import MovieCreate, MovieUpdate, MovieResponse
+from app.schemas import MovieCreate, MovieUpdate, MovieResponse, parse_fields
 
 class TestSchemas:
     """Test cases for Pydantic schemas"""
@@ -175,4 +175,12 @@ class TestSchemas:
                 year=2000,
                 rating=8.0
                 # Missing id
-            )
\ No newline at end of file
+            )
+
+    def test_parse_fields(self):
+        """Test sparse fieldset parsing"""
+        assert parse_fields(None) is None
+        assert parse_fields("") is None
+        assert parse_fields("title, id,title") == ["title", "id"]
+        with pytest.raises(ValueError):
+            parse_fields("id,budget")
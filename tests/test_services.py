@@ -1,6 +1,9 @@
+import asyncio
+import threading
 import pytest
+from sqlalchemy import event, func, select
 from app.schemas import MovieCreate, MovieUpdate
-from app.services import MovieService
+from app.services import DuplicateMovieError, MovieService, dedup_key
 from app.database import Movie
 
 class TestMovieService:
@@ -162,4 +165,187 @@ class TestMovieService:
         
         # Get movies from future range
         movies = MovieService.get_movies_by_year_range(db_session, 2025, 2030)
-        assert len(movies) == 0
\ No newline at end of file
+        assert len(movies) == 0
+
+    def test_committed_writes_notify_listeners(self, db_session, sample_movie):
+        """Test listeners receive each committed write and the generation moves"""
+        changes = []
+        
+        def listener(*change):
+            changes.append(change)
+        
+        MovieService.subscribe(listener)
+        try:
+            generation = MovieService.generation
+            movie = MovieService.create_movie(db_session, MovieCreate(**sample_movie))
+            MovieService.update_movie(db_session, movie.id, MovieUpdate(rating=9.0))
+            MovieService.delete_movie(db_session, movie.id)
+        finally:
+            MovieService.unsubscribe(listener)
+        
+        assert [(op, movie_id) for op, movie_id, _ in changes] == [
+            ("create", movie.id), ("update", movie.id), ("delete", movie.id)
+        ]
+        assert changes[1][2]["rating"] == 9.0
+        assert MovieService.generation == generation + 3
+    
+    def test_generation_moves_after_listeners(self, db_session, sample_movie):
+        """Test the generation only changes once listeners have applied a write"""
+        generation = MovieService.generation
+        seen = []
+        
+        def listener(op, movie_id, values):
+            seen.append(MovieService.generation)
+        
+        MovieService.subscribe(listener)
+        try:
+            MovieService.create_movie(db_session, MovieCreate(**sample_movie))
+        finally:
+            MovieService.unsubscribe(listener)
+        
+        assert seen == [generation]
+        assert MovieService.generation == generation + 1
+    
+    def test_create_movie_logs_change(self, db_session, sample_movie):
+        """Test writes are recorded in the change log with increasing sequence"""
+        movie = MovieService.create_movie(db_session, MovieCreate(**sample_movie))
+        MovieService.delete_movie(db_session, movie.id)
+        
+        changes = MovieService.get_changes(db_session, since=0)
+        assert [change.op for change in changes] == ["create", "delete"]
+        assert changes[0].seq < changes[1].seq
+        assert changes[0].data["title"] == sample_movie["title"]
+        
+        assert MovieService.get_changes(db_session, since=changes[0].seq) == changes[1:]
+    
+    def test_wait_for_write_async(self, db_session, sample_movie):
+        """Test the async wait is woken from the writer's thread and times out otherwise"""
+        generation = MovieService.generation
+        
+        async def wait(timeout):
+            return await MovieService.wait_for_write_async(generation, timeout)
+        
+        assert asyncio.run(wait(0.05)) is False
+        writer = threading.Timer(
+            0.05, MovieService.create_movie, args=(db_session, MovieCreate(**sample_movie))
+        )
+        writer.start()
+        assert asyncio.run(wait(5)) is True
+        writer.join()
+    
+    def test_get_movies_with_fields(self, db_session, sample_movies):
+        """Test projected queries return only the requested columns"""
+        for movie_data in sample_movies:
+            MovieService.create_movie(db_session, MovieCreate(**movie_data))
+        
+        movies = MovieService.get_movies(db_session, fields=["id", "title"])
+        assert [set(movie) for movie in movies] == [{"id", "title"}] * 3
+        
+        movies = MovieService.get_movies_by_director(db_session, "Nolan", fields=["year"])
+        assert sorted(movie["year"] for movie in movies) == [2010, 2014]
+    
+    def test_writes_do_not_select(self, db_session, sample_movie):
+        """Test update and delete run as single statements without a SELECT"""
+        movie = MovieService.create_movie(db_session, MovieCreate(**sample_movie))
+        statements = []
+        
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement.split()[0].upper())
+        
+        connection = db_session.connection()
+        event.listen(connection, "before_cursor_execute", capture)
+        try:
+            updated = MovieService.update_movie(db_session, movie.id, MovieUpdate(rating=9.1))
+            assert updated.rating == 9.1
+            assert MovieService.delete_movie(db_session, movie.id) is True
+        finally:
+            event.remove(connection, "before_cursor_execute", capture)
+        
+        assert "SELECT" not in statements
+        assert statements.count("UPDATE") == 1
+        assert statements.count("DELETE") == 1
+    
+    def test_get_movies_by_ids(self, db_session, sample_movies):
+        """Test batch lookup uses the requested order and skips unknown IDs"""
+        ids = [
+            MovieService.create_movie(db_session, MovieCreate(**movie_data)).id
+            for movie_data in sample_movies
+        ]
+        
+        movies = MovieService.get_movies_by_ids(db_session, [ids[1], 999, ids[0]])
+        assert [movie.id for movie in movies] == [ids[1], ids[0]]
+        assert MovieService.get_movies_by_ids(db_session, []) == []
+    
+    def test_dedup_key(self):
+        """Test case, accents, punctuation and spacing do not change the key"""
+        assert dedup_key("The Matrix", "The Wachowskis", 1999) == dedup_key("the  MATRIX!", "The Wachowskis", 1999)
+        assert dedup_key("Amélie", "Jean-Pierre Jeunet", 2001) == "amelie|jean pierre jeunet|2001"
+        assert dedup_key("The Matrix", "The Wachowskis", 1999) != dedup_key("The Matrix", "The Wachowskis", 2003)
+    
+    def test_upsert_movie_on_conflict(self, db_session, sample_movie):
+        """Test error, skip and update handling of a duplicate create"""
+        movie = MovieService.create_movie(db_session, MovieCreate(**sample_movie))
+        duplicate = MovieCreate(**{**sample_movie, "title": "the matrix", "rating": 9.0})
+        
+        with pytest.raises(DuplicateMovieError):
+            MovieService.create_movie(db_session, duplicate)
+        
+        skipped, status = MovieService.upsert_movie(db_session, duplicate, "skip")
+        assert (skipped.id, skipped.rating, status) == (movie.id, 8.7, "skipped")
+        
+        updated, status = MovieService.upsert_movie(db_session, duplicate, "update")
+        assert (updated.id, updated.title, updated.rating, status) == (movie.id, "the matrix", 9.0, "updated")
+        assert MovieService.get_movies_count(db_session) == 1
+        assert [change.op for change in MovieService.get_changes(db_session)] == ["create", "update"]
+    
+    def test_update_movie_to_duplicate(self, db_session, sample_movies):
+        """Test renaming a movie onto another movie's key is rejected"""
+        matrix, inception, _ = [
+            MovieService.create_movie(db_session, MovieCreate(**movie_data))
+            for movie_data in sample_movies
+        ]
+        
+        with pytest.raises(DuplicateMovieError):
+            MovieService.update_movie(
+                db_session, inception.id, MovieUpdate(title="The Matrix", director="The Wachowskis", year=1999)
+            )
+        
+        # The service's rollback stays inside the test's transaction
+        assert MovieService.get_movie(db_session, inception.id).title == "Inception"
+        MovieService.create_movie(db_session, MovieCreate(title="Tenet", director="Christopher Nolan", year=2020, rating=7.3))
+        with db_session.get_bind().engine.connect() as other:
+            assert other.execute(select(func.count(Movie.id))).scalar() == 0
+    
+    def test_upsert_movies(self, db_session, sample_movies):
+        """Test bulk creates report per-row status and roll back on an error"""
+        movies = [MovieCreate(**movie_data) for movie_data in sample_movies]
+        MovieService.create_movie(db_session, movies[0])
+        
+        results = MovieService.upsert_movies(db_session, movies, "skip")
+        assert [status for _, status in results] == ["skipped", "created", "created"]
+        
+        with pytest.raises(DuplicateMovieError) as excinfo:
+            MovieService.upsert_movies(
+                db_session, [MovieCreate(title="Tenet", director="Christopher Nolan", year=2020, rating=7.3)] + movies
+            )
+        assert excinfo.value.index == 1
+        assert MovieService.search_movies_by_title(db_session, "Tenet") == []
+    
+    def test_writes_without_commit(self, db_session, sample_movies):
+        """Test commit=False writes are visible in the session and published on commit"""
+        seen = []
+        
+        def listener(op, movie_id, values):
+            seen.append(op)
+        
+        MovieService.subscribe(listener)
+        try:
+            movie = MovieService.create_movie(db_session, MovieCreate(**sample_movies[0]), commit=False)
+            MovieService.update_movie(db_session, movie.id, MovieUpdate(rating=9.0), commit=False)
+            assert MovieService.get_movie(db_session, movie.id).rating == 9.0
+            assert seen == []
+            
+            db_session.commit()
+            assert seen == ["create", "update"]
+        finally:
+            MovieService.unsubscribe(listener)
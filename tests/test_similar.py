@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy.orm import Session
+from app.database import Base, make_engine
+from app.schemas import MovieCreate, MovieUpdate
+from app.services import MovieService
+from app.similar import SimilarityIndex, similar_index, title_tokens
+
+@pytest.fixture
+def movies(db_session, sample_movies):
+    extra = [
+        {"title": "The Matrix Reloaded", "director": "The Wachowskis", "year": 2003, "rating": 7.2},
+        {"title": "Casablanca", "director": "Michael Curtiz", "year": 1942, "rating": 8.5},
+    ]
+    return [
+        MovieService.create_movie(db_session, MovieCreate(**movie_data))
+        for movie_data in sample_movies + extra
+    ]
+
+@pytest.fixture
+def index(db_session, movies):
+    index = SimilarityIndex()
+    index.load(db_session)
+    MovieService.subscribe(index.apply)
+    yield index
+    MovieService.unsubscribe(index.apply)
+
+@pytest.fixture
+def similar_enabled(monkeypatch):
+    monkeypatch.setattr("app.main.SIMILAR_INDEX_ENABLED", True)
+    yield
+    similar_index.clear()
+
+class TestSimilarityIndex:
+    """Test cases for the similar-movies index"""
+
+    def test_title_tokens(self):
+        """Test titles are reduced to distinct normalised words"""
+        assert title_tokens("The Lord of the Rings: The Two Towers") == ("lord", "rings", "towers", "two")
+
+    def test_ranks_by_shared_features(self, index, movies):
+        """Test director and title overlap outrank unrelated movies"""
+        matrix, inception, interstellar, reloaded, casablanca = movies
+
+        similar = index.similar(matrix.id, k=3)
+        assert [movie["id"] for movie in similar] == [reloaded.id]
+
+        assert index.similar(inception.id, k=1)[0]["id"] == interstellar.id
+        assert matrix.id not in [movie["id"] for movie in index.similar(matrix.id, k=10)]
+        assert index.similar(999) is None
+
+    def test_follows_writes(self, db_session, index, movies):
+        """Test created, updated and deleted movies change the neighbours"""
+        matrix, inception, interstellar, reloaded, casablanca = movies
+
+        MovieService.delete_movie(db_session, reloaded.id)
+        assert reloaded.id not in [movie["id"] for movie in index.similar(matrix.id)]
+
+        MovieService.update_movie(db_session, casablanca.id, MovieUpdate(director="Christopher Nolan", year=2017))
+        assert casablanca.id in [movie["id"] for movie in index.similar(inception.id, k=2)]
+
+        tenet = MovieService.create_movie(
+            db_session, MovieCreate(title="Interstellar Tenet", director="Christopher Nolan", year=2014, rating=8.6)
+        )
+        assert index.similar(interstellar.id, k=1)[0]["id"] == tenet.id
+
+    def test_background_build(self, tmp_path, sample_movies, monkeypatch):
+        """Test a scan and build in a worker process installs and replays queued writes"""
+        # The worker opens its own connection, so the rows must be committed to a file
+        engine = make_engine(f"sqlite:///{tmp_path / 'similar.db'}")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine, expire_on_commit=False) as db:
+            movies = [MovieService.create_movie(db, MovieCreate(**movie_data)) for movie_data in sample_movies]
+            monkeypatch.setattr("app.similar.INLINE_BUILD_ROWS", 0)
+            index = SimilarityIndex()
+            future = index.load(db, background=True)
+        assert future is not None
+        assert index.building is True
+
+        index.apply("delete", movies[0].id, None)
+        future.result(timeout=60)
+        while index.building:
+            pass
+        engine.dispose()
+
+        assert index.loaded is True
+        assert len(index) == len(movies) - 1
+
+    def test_similar_endpoint_disabled(self, client):
+        """Test the endpoint answers 503 without Retry-After when the index is off"""
+        response = client.get("/movies/1/similar")
+        assert response.status_code == 503
+        assert "retry-after" not in response.headers
+
+    def test_similar_endpoint(self, similar_enabled, client, sample_movies):
+        """Test the endpoint serves neighbours from the startup index"""
+        ids = [client.post("/movies/", json=movie).json()["id"] for movie in sample_movies]
+
+        response = client.get(f"/movies/{ids[1]}/similar?k=1")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["movie_id"] == ids[1]
+        assert [movie["title"] for movie in data["similar"]] == ["Interstellar"]
+
+        assert client.get("/movies/999/similar").status_code == 404
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+from app.singleflight import SingleFlight
+
+class TestSingleFlight:
+    """Test cases for request coalescing"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test identical concurrent calls run the function once"""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def slow_query():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return b"payload"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", slow_query)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("k", slow_query)))
+            for _ in range(5)
+        ]
+        for thread in followers:
+            thread.start()
+        for thread in [leader] + followers:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [b"payload"] * 6
+        assert flight.in_flight() == 0
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test a finished call does not serve later requests"""
+        flight = SingleFlight()
+        counter = iter(range(10))
+
+        assert flight.do("k", lambda: next(counter)) == 0
+        assert flight.do("k", lambda: next(counter)) == 1
+
+    def test_exception_propagates_to_waiters(self):
+        """Test the leader's exception is raised for every waiter"""
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing():
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                flight.do("k", failing)
+            except ValueError as exc:
+                errors.append(str(exc))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        assert errors == ["boom", "boom"]
+
+    def test_async_calls_share_one_execution(self):
+        """Test concurrent coroutine callers collapse onto one execution"""
+        flight = SingleFlight()
+        calls = []
+
+        def slow_query():
+            calls.append(1)
+            time.sleep(0.05)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                *[flight.do_async("k", slow_query) for _ in range(10)]
+            )
+
+        assert asyncio.run(run()) == ["result"] * 10
+        assert len(calls) == 1
@@ -0,0 +1,180 @@
+import struct
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.autocomplete import AutocompleteIndex, autocomplete_index
+from app.database import get_db
+from app.main import create_app
+from app.read_model import MovieReadModel
+from app.schemas import MovieCreate, MovieUpdate
+from app.services import MovieService
+from app.similar import SimilarityIndex
+from app.snapshot import MAGIC, Snapshot, SnapshotError, open_snapshot, write_snapshot
+
+@pytest.fixture
+def movies(db_session, sample_movies):
+    extra = {"title": "Amélie", "director": "Jean-Pierre Jeunet", "year": 2001, "rating": 8.3}
+    return [
+        MovieService.create_movie(db_session, MovieCreate(**movie_data))
+        for movie_data in sample_movies + [extra]
+    ]
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "movies.snapshot")
+
+@pytest.fixture
+def autocomplete_enabled(monkeypatch):
+    monkeypatch.setattr("app.main.AUTOCOMPLETE_INDEX_ENABLED", True)
+    yield
+    autocomplete_index.clear()
+
+def _fresh(db_session):
+    read_model, autocomplete, similar = MovieReadModel(), AutocompleteIndex(), SimilarityIndex()
+    read_model.load(db_session)
+    autocomplete.load(db_session)
+    similar.load(db_session)
+    return read_model, autocomplete, similar
+
+def _from_snapshot(path):
+    snapshot = Snapshot(path)
+    read_model, autocomplete, similar = MovieReadModel(), AutocompleteIndex(), SimilarityIndex()
+    read_model.load_snapshot(snapshot)
+    autocomplete.load_snapshot(snapshot)
+    similar.load_snapshot(snapshot)
+    snapshot.close()
+    return read_model, autocomplete, similar
+
+def _assert_same(loaded, expected):
+    (read_model, autocomplete, similar), (read_model_2, autocomplete_2, similar_2) = loaded, expected
+    assert read_model.year_range(1900, 2030) == read_model_2.year_range(1900, 2030)
+    assert read_model.stats() == read_model_2.stats()
+    for query in ["the", "amel", "nolan", "jean pierre"]:
+        assert autocomplete.search(query) == autocomplete_2.search(query)
+    for movie_id in [row["id"] for row in read_model_2.year_range(1900, 2030)]:
+        assert similar.similar(movie_id) == similar_2.similar(movie_id)
+
+class TestSnapshot:
+    """Test cases for warm-start snapshots"""
+
+    def test_round_trip(self, db_session, movies, snapshot_path):
+        """Test structures loaded from a snapshot match ones loaded from the table"""
+        result = write_snapshot(db_session, snapshot_path)
+        assert result["rows"] == 4
+        assert result["change_seq"] == MovieService.last_change_seq(db_session)
+
+        snapshot = Snapshot(snapshot_path)
+        assert snapshot.rows == 4
+        assert list(snapshot.column("ids")) == [movie.id for movie in movies]
+        assert snapshot.strings("title")[3] == "Amélie"
+        snapshot.close()
+
+        _assert_same(_from_snapshot(snapshot_path), _fresh(db_session))
+
+    def test_similar_index_builds_from_snapshot_in_worker(self, db_session, movies, snapshot_path, monkeypatch):
+        """Test a background similarity build maps the snapshot in the worker process"""
+        write_snapshot(db_session, snapshot_path)
+        monkeypatch.setattr("app.similar.INLINE_BUILD_ROWS", 0)
+        snapshot = Snapshot(snapshot_path)
+        similar = SimilarityIndex()
+        future = similar.load_snapshot(snapshot, background=True)
+        snapshot.close()
+        future.result(timeout=60)
+        while similar.building:
+            pass
+
+        expected = _fresh(db_session)[2]
+        assert len(similar) == len(movies)
+        assert similar.similar(movies[1].id) == expected.similar(movies[1].id)
+
+    def test_replay_after_snapshot(self, db_session, movies, snapshot_path):
+        """Test replaying the change log brings snapshot-loaded structures up to date"""
+        snapshot_seq = write_snapshot(db_session, snapshot_path)["change_seq"]
+        MovieService.update_movie(db_session, movies[0].id, MovieUpdate(rating=9.9, year=2000))
+        MovieService.delete_movie(db_session, movies[1].id)
+        MovieService.create_movie(
+            db_session, MovieCreate(title="Tenet", director="Christopher Nolan", year=2020, rating=7.3)
+        )
+
+        loaded = _from_snapshot(snapshot_path)
+        for structure in loaded:
+            MovieService.subscribe(structure.apply)
+        try:
+            assert MovieService.replay_changes(db_session, snapshot_seq) == MovieService.last_change_seq(db_session)
+        finally:
+            for structure in loaded:
+                MovieService.unsubscribe(structure.apply)
+
+        _assert_same(loaded, _fresh(db_session))
+
+    def test_rejects_unreadable_files(self, db_session, movies, snapshot_path, tmp_path):
+        """Test foreign, newer and truncated files are refused"""
+        write_snapshot(db_session, snapshot_path)
+        with open(snapshot_path, "rb") as source:
+            data = source.read()
+
+        cases = {
+            "foreign": b"PK\x03\x04" + data[4:],
+            "newer": MAGIC + struct.pack("<I", 99) + data[12:],
+            "truncated": data[:len(data) // 2],
+        }
+        for name, content in cases.items():
+            path = tmp_path / name
+            path.write_bytes(content)
+            with pytest.raises(SnapshotError):
+                Snapshot(str(path))
+            assert open_snapshot(str(path)) is None
+        assert open_snapshot(str(tmp_path / "missing")) is None
+
+    def test_startup_loads_snapshot(self, db_session, movies, snapshot_path, autocomplete_enabled, monkeypatch):
+        """Test app startup warms the autocomplete index from a snapshot plus later writes"""
+        write_snapshot(db_session, snapshot_path)
+        MovieService.create_movie(
+            db_session, MovieCreate(title="Tenet", director="Christopher Nolan", year=2020, rating=7.3)
+        )
+        monkeypatch.setattr("app.main.SNAPSHOT_PATH", snapshot_path)
+        monkeypatch.setattr(AutocompleteIndex, "load", lambda self, db: pytest.fail("scanned the table"))
+
+        def override_get_db():
+            yield db_session
+
+        app = create_app()
+        app.dependency_overrides[get_db] = override_get_db
+        with TestClient(app):
+            assert [movie["title"] for movie in autocomplete_index.search("nolan")] == [
+                "Inception", "Interstellar", "Tenet"
+            ]
+
+    def test_startup_skips_stale_snapshot(self, db_session, movies, snapshot_path, autocomplete_enabled, monkeypatch):
+        """Test a snapshot too far behind the change log is ignored in favour of a scan"""
+        write_snapshot(db_session, snapshot_path)
+        MovieService.update_movie(db_session, movies[0].id, MovieUpdate(rating=9.9))
+        monkeypatch.setattr("app.main.SNAPSHOT_PATH", snapshot_path)
+        monkeypatch.setattr("app.main.SNAPSHOT_MAX_REPLAY", 0)
+        monkeypatch.setattr(AutocompleteIndex, "load_snapshot", lambda self, snapshot: pytest.fail("used the snapshot"))
+
+        def override_get_db():
+            yield db_session
+
+        app = create_app()
+        app.dependency_overrides[get_db] = override_get_db
+        with TestClient(app):
+            assert autocomplete_index.search("matrix")[0]["rating"] == 9.9
+
+    def test_startup_rejects_snapshot_ahead_of_change_log(
+        self, db_session, movies, snapshot_path, autocomplete_enabled, monkeypatch
+    ):
+        """Test a snapshot newer than the change log, e.g. from another database, is ignored"""
+        write_snapshot(db_session, snapshot_path)
+        monkeypatch.setattr(MovieService, "last_change_seq", lambda db: 0)
+        monkeypatch.setattr("app.main.SNAPSHOT_PATH", snapshot_path)
+        monkeypatch.setattr(AutocompleteIndex, "load_snapshot", lambda self, snapshot: pytest.fail("used the snapshot"))
+
+        def override_get_db():
+            yield db_session
+
+        app = create_app()
+        app.dependency_overrides[get_db] = override_get_db
+        with TestClient(app):
+            assert autocomplete_index.search("matrix")[0]["title"] == "The Matrix"
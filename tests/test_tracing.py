@@ -0,0 +1,86 @@
+import pytest
+from app.schemas import MovieCreate
+from app.services import MovieService
+from app.tracing import InMemorySpanExporter, Tracer, parse_traceparent, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemorySpanExporter()
+    monkeypatch.setattr(tracer, "sample_ratio", 1.0)
+    monkeypatch.setattr(tracer, "exporters", [exporter])
+    return exporter
+
+class TestTracing:
+    """Test cases for request tracing"""
+
+    def test_parse_traceparent(self):
+        """Test W3C traceparent headers are parsed and invalid ones ignored"""
+        assert parse_traceparent(TRACEPARENT) == (TRACE_ID, "00f067aa0ba902b7", True)
+        assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+        assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+        assert parse_traceparent("ff-" + TRACEPARENT[3:]) is None
+        assert parse_traceparent("garbage") is None
+        assert parse_traceparent(None) is None
+
+    def test_sample_ratio(self):
+        """Test the ratio sampler and that a sampled parent always wins"""
+        never, always = Tracer(0.0), Tracer(1.0)
+        never.exporters = always.exporters = [InMemorySpanExporter()]
+        assert never.start_root("GET /") is None
+        assert always.start_root("GET /") is not None
+        assert never.start_root("GET /", TRACEPARENT).trace_id == TRACE_ID
+        assert always.start_root("GET /", TRACEPARENT.replace("-01", "-00")) is None
+
+    def test_request_spans(self, client, sample_movie, exporter):
+        """Test a request yields route, service, SQL and serialization spans in one trace"""
+        movie_id = client.post("/movies/", json=sample_movie).json()["id"]
+        exporter.clear()
+
+        response = client.get(f"/movies/{movie_id}", headers={"traceparent": TRACEPARENT})
+        assert response.status_code == 200
+
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        root = spans["GET /movies/{movie_id}"]
+        assert root.kind == "server"
+        assert root.trace_id == TRACE_ID
+        assert root.parent_id == "00f067aa0ba902b7"
+        assert root.attributes["http.response.status_code"] == 200
+
+        service = spans["MovieService.get_movie"]
+        assert service.parent_id == root.span_id
+        query = spans["SELECT"]
+        assert query.parent_id == service.span_id
+        assert "FROM movies" in query.attributes["db.statement"]
+        assert spans["serialize"].parent_id == root.span_id
+        assert {span.trace_id for span in spans.values()} == {TRACE_ID}
+
+    def test_write_row_counts(self, client, sample_movie, exporter):
+        """Test DML statements record the rows they touched"""
+        movie_id = client.post("/movies/", json=sample_movie).json()["id"]
+        exporter.clear()
+
+        client.put(f"/movies/{movie_id}", json={"rating": 9.0})
+        updates = [span for span in exporter.get_finished_spans() if span.name == "UPDATE"]
+        assert updates[0].attributes["db.rowcount"] == 1
+
+    def test_traced_identity_update(self, client, sample_movie, exporter):
+        """Test a traced PUT that rewrites the dedup key runs its UPDATE without RETURNING"""
+        movie_id = client.post("/movies/", json=sample_movie).json()["id"]
+        exporter.clear()
+
+        response = client.put(f"/movies/{movie_id}", json={"title": "The Matrix Reloaded"})
+        assert response.status_code == 200
+        assert response.json()["title"] == "The Matrix Reloaded"
+        updates = [span for span in exporter.get_finished_spans() if span.name == "UPDATE"]
+        assert len(updates) == 2
+        assert "RETURNING" not in updates[1].attributes["db.statement"]
+        assert [span.attributes["db.rowcount"] for span in updates] == [1, 1]
+
+    def test_untraced_calls_record_nothing(self, client, db_session, sample_movie, exporter):
+        """Test nothing is recorded outside a sampled request"""
+        MovieService.create_movie(db_session, MovieCreate(**sample_movie))
+        client.get("/movies/", headers={"traceparent": TRACEPARENT.replace("-01", "-00")})
+        assert exporter.get_finished_spans() == []